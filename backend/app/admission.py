@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+from app.config import settings
+from app.metrics import metrics
+from app.profiling import stage
+
+# Lower values are served first when work queues for a shared resource
+INTERACTIVE = 0
+BULK = 1
+
+
+class Overloaded(Exception):
+    """Raised when a limiter turns work away; mapped to 429/503 + Retry-After."""
+
+    def __init__(self, name: str, status_code: int, retry_after: int) -> None:
+        super().__init__(f"{name} is overloaded")
+        self.name = name
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """
+    Concurrency limit with a priority-ordered wait queue.
+
+    At most `limit` holders run at once. Others wait, lowest priority value
+    first, FIFO within a priority. With max_queue set, arrivals that find
+    the queue full are rejected at once (429); with timeout set, waiters
+    that are not admitted in time are rejected (503).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_queue: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self._limit = max(1, limit)
+        self._max_queue = max_queue
+        self._timeout = timeout
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        # Smoothed hold time, used to suggest a Retry-After
+        self._hold_seconds = 1.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._hold_seconds * (self.queued + 1) / self._limit))
+
+    def _release(self) -> None:
+        # Hand the slot straight to the next live waiter
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+        metrics.set(f"{self.name}_active", self._active)
+
+    async def _acquire(self, priority: int) -> None:
+        if self._active < self._limit and not self.queued:
+            self._active += 1
+            metrics.set(f"{self.name}_active", self._active)
+            return
+        if self._max_queue is not None and self.queued >= self._max_queue:
+            metrics.incr(f"{self.name}_rejected_total")
+            raise Overloaded(self.name, 429, self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+        metrics.add(f"{self.name}_queued", 1)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self._timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted just as we gave up: pass the slot on
+                self._release()
+            else:
+                waiter.cancel()
+            if isinstance(error, asyncio.TimeoutError):
+                metrics.incr(f"{self.name}_timeouts_total")
+                raise Overloaded(self.name, 503, self._retry_after()) from None
+            raise
+        finally:
+            metrics.add(f"{self.name}_queued", -1)
+
+    @asynccontextmanager
+    async def hold(self, priority: int = INTERACTIVE) -> AsyncIterator[None]:
+        queued_at = time.perf_counter()
+        with stage(f"{self.name}_wait"):
+            await self._acquire(priority)
+        started = time.perf_counter()
+        metrics.observe(f"{self.name}_wait_seconds", started - queued_at)
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.perf_counter() - started)
+            self._release()
+
+
+# Admission per endpoint: bounded queues, fast rejection when full
+analyze_limiter = Limiter(
+    "analyze",
+    settings.analyze_max_concurrency,
+    max_queue=settings.analyze_max_queue,
+    timeout=settings.analyze_queue_timeout,
+)
+ingest_limiter = Limiter(
+    "ingest",
+    settings.ingest_max_concurrency,
+    max_queue=settings.ingest_max_queue,
+    timeout=settings.ingest_queue_timeout,
+)
+
+# Shared resources: /analyze (INTERACTIVE) is served before /ingest (BULK)
+embedder_gate = Limiter("embedder", settings.embedder_max_concurrency)
+llm_gate = Limiter("llm", settings.llm_max_concurrency)
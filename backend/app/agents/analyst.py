@@ -11,42 +11,32 @@ from app.schemas.models import (
     DocumentChunk,
     LLMAnalysisOutput,
 )
-from app.llm import get_client, llm_enabled
+from app.admission import llm_gate
+from app.deadline import hedged
+from app.llm import get_async_client, llm_enabled
+from app.profiling import record_tokens, traced
 from app.config import settings
 
 
-def analyze_claim(
-    request: AnalysisRequest,
-    retrieved: List[Tuple[float, DocumentChunk]],
-) -> tuple[str, str, List[Citation], str]:
-    if not retrieved:
-        return (
-            "needs-review",
-            "No relevant clauses were retrieved. Manual review required.",
-            [],
-            "high",
-        )
-
-    if not llm_enabled():
-        citations: List[Citation] = []
-        for _, chunk in retrieved:
-            citations.append(
-                Citation(
-                    quote=chunk.text[:240],
-                    page_number=chunk.metadata.page_number,
-                    source_filename=chunk.metadata.source_filename,
-                    policy_id=chunk.metadata.policy_id,
-                    text=chunk.text,
-                )
-            )
-
-        rationale = (
-            "Retrieved relevant policy clauses and matched them against the claim. "
-            "Review the cited sections to confirm coverage and exclusions."
+def retrieval_citations(retrieved: List[Tuple[float, DocumentChunk]]) -> List[Citation]:
+    """Cite the retrieved chunks themselves (no LLM involved)."""
+    return [
+        Citation(
+            quote=chunk.text[:240],
+            page_number=chunk.metadata.page_number,
+            source_filename=chunk.metadata.source_filename,
+            policy_id=chunk.metadata.policy_id,
+            text=chunk.text,
         )
+        for _, chunk in retrieved
+    ]
 
-        return "likely-covered", rationale, citations, "medium"
 
+def build_prompts(
+    request: AnalysisRequest,
+    retrieved: List[Tuple[float, DocumentChunk]],
+) -> Tuple[str, str]:
+    """System and user prompt of the analyst call."""
     context_blocks = []
     for _, chunk in retrieved:
         # Include section metadata for context
@@ -82,16 +72,50 @@ Text: {chunk.text}
         "Analyze this claim based on the policy text above. "
         "Provide a JSON response with fields: 'decision', 'rationale', 'citations' (array of objects with quote, page_number, source_filename), and 'risk_level'."
     )
+    return system_prompt, user_prompt
 
-    client = get_client()
-    response = client.chat.completions.create(
-        model=settings.groq_chat_model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.2,
-    )
+
+@traced("analyze_claim")
+async def analyze_claim(
+    request: AnalysisRequest,
+    retrieved: List[Tuple[float, DocumentChunk]],
+) -> tuple[str, str, List[Citation], str]:
+    if not retrieved:
+        return (
+            "needs-review",
+            "No relevant clauses were retrieved. Manual review required.",
+            [],
+            "high",
+        )
+
+    if not llm_enabled():
+        citations = retrieval_citations(retrieved)
+
+        rationale = (
+            "Retrieved relevant policy clauses and matched them against the claim. "
+            "Review the cited sections to confirm coverage and exclusions."
+        )
+
+        return "likely-covered", rationale, citations, "medium"
+
+    system_prompt, user_prompt = build_prompts(request, retrieved)
+
+    client = get_async_client()
+
+    async def complete():
+        async with llm_gate.hold():
+            return await client.chat.completions.create(
+                model=settings.groq_chat_model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=0.2,
+            )
+
+    # Hedged against slow responses and bounded by the request deadline
+    response = await hedged("analyst_llm", complete)
+    record_tokens("analyze_claim", response.usage, len(system_prompt) + len(user_prompt))
 
     content = response.choices[0].message.content or "{}"
     
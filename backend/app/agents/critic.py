@@ -6,11 +6,15 @@ import json
 from pydantic import ValidationError
 
 from app.schemas.models import Citation, DocumentChunk, LLMCriticOutput
-from app.llm import get_client, llm_enabled
+from app.admission import llm_gate
+from app.deadline import hedged
+from app.llm import get_async_client, llm_enabled
+from app.profiling import record_tokens, traced
 from app.config import settings
 
 
-def validate_citations(
+@traced("validate_citations")
+async def validate_citations(
     citations: List[Citation],
     retrieved: List[Tuple[float, DocumentChunk]] | None = None,
 ) -> List[Citation]:
@@ -60,15 +64,22 @@ def validate_citations(
         "Return JSON with field keep_indices as an array of citation indices to keep."
     )
 
-    client = get_client()
-    response = client.chat.completions.create(
-        model=settings.groq_chat_model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.0,
-    )
+    client = get_async_client()
+
+    async def complete():
+        async with llm_gate.hold():
+            return await client.chat.completions.create(
+                model=settings.groq_chat_model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=0.0,
+            )
+
+    # Hedged against slow responses and bounded by the request deadline
+    response = await hedged("critic_llm", complete)
+    record_tokens("validate_citations", response.usage, len(system_prompt) + len(user_prompt))
 
     content = response.choices[0].message.content or "{}"
     try:
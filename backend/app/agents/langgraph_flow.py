@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 from typing import TypedDict, List, Tuple
+import functools
 
 from langgraph.graph import StateGraph, END
 
 from app.agents.retriever import retrieve_chunks
 from app.agents.analyst import analyze_claim
 from app.agents.critic import validate_citations
+from app.config import settings
+from app.deadline import DeadlineExceeded, has_budget
+from app.llm import llm_enabled
 from app.schemas.models import (
     AnalysisRequest,
     AnalysisResponse,
@@ -23,15 +27,19 @@ class WorkflowState(TypedDict):
     rationale: str
     citations: List[Citation]
     risk_level: str
+    path: str
 
 
-def _retrieve(state: WorkflowState, store: VectorStore) -> WorkflowState:
-    retrieved = retrieve_chunks(store, state["request"])
+async def _retrieve(state: WorkflowState, store: VectorStore) -> WorkflowState:
+    if state["retrieved"]:
+        # Already retrieved by the caller (the fast-path router needs it first)
+        return state
+    retrieved = await retrieve_chunks(store, state["request"])
     return {**state, "retrieved": retrieved}
 
 
-def _analyze(state: WorkflowState) -> WorkflowState:
-    decision, rationale, citations, risk_level = analyze_claim(
+async def _analyze(state: WorkflowState) -> WorkflowState:
+    decision, rationale, citations, risk_level = await analyze_claim(
         state["request"], state["retrieved"]
     )
     return {
@@ -43,15 +51,26 @@ def _analyze(state: WorkflowState) -> WorkflowState:
     }
 
 
-def _critic(state: WorkflowState) -> WorkflowState:
-    verified = validate_citations(state["citations"], state["retrieved"])
-    return {**state, "citations": verified}
+async def _critic(state: WorkflowState) -> WorkflowState:
+    if has_budget(settings.critic_min_budget_seconds):
+        try:
+            verified = await validate_citations(state["citations"], state["retrieved"])
+            return {**state, "citations": verified}
+        except DeadlineExceeded:
+            pass
+    # Out of time: keep the analyst's citations that carry page metadata
+    verified = await validate_citations(state["citations"])
+    return {**state, "citations": verified, "path": "llm-no-critic"}
 
 
-def run_langgraph(store: VectorStore, request: AnalysisRequest) -> AnalysisResponse:
+async def run_langgraph(
+    store: VectorStore,
+    request: AnalysisRequest,
+    retrieved: List[Tuple[float, DocumentChunk]] | None = None,
+) -> AnalysisResponse:
     graph = StateGraph(WorkflowState)
 
-    graph.add_node("retrieve", lambda state: _retrieve(state, store))
+    graph.add_node("retrieve", functools.partial(_retrieve, store=store))
     graph.add_node("analyze", _analyze)
     graph.add_node("critic", _critic)
 
@@ -64,18 +83,20 @@ def run_langgraph(store: VectorStore, request: AnalysisRequest) -> AnalysisRespo
 
     initial_state: WorkflowState = {
         "request": request,
-        "retrieved": [],
+        "retrieved": retrieved or [],
         "decision": "needs-review",
         "rationale": "",
         "citations": [],
         "risk_level": "medium",
+        "path": "llm" if llm_enabled() else "retrieval-only",
     }
 
-    final_state = compiled.invoke(initial_state)
+    final_state = await compiled.ainvoke(initial_state)
 
     return AnalysisResponse(
         decision=final_state["decision"],
         rationale=final_state["rationale"],
         citations=final_state["citations"],
         risk_level=final_state["risk_level"],
+        path=final_state["path"],
     )
@@ -1,20 +1,84 @@
 from __future__ import annotations
 
+from typing import Dict, List, Set, Tuple
+import asyncio
+import hashlib
+import json
 import logging
+import random
 
-from app.agents.router import route_request
+from app.agents.router import fast_path_response, route_request
 from app.agents.retriever import retrieve_chunks
-from app.agents.analyst import analyze_claim
+from app.agents.analyst import analyze_claim, retrieval_citations
 from app.agents.critic import validate_citations
-from app.agents.langgraph_flow import run_langgraph
+from app.agents.self_query import resolve_policy_scope
 from app.config import settings
-from app.schemas.models import AnalysisRequest, AnalysisResponse
+from app.deadline import DeadlineExceeded, bounded, deadline_scope, has_budget
+from app.llm import llm_enabled
+from app.metrics import metrics
+from app.profiling import stage, trace_request, untraced
+from app.schemas.models import AnalysisRequest, AnalysisResponse, DocumentChunk
 from app.vectorstores.base import VectorStore
 
 logger = logging.getLogger(__name__)
 
+# Analyses currently running in this worker, by request key
+_IN_FLIGHT: Dict[str, asyncio.Task] = {}
+# Background LLM re-checks of fast-path answers (kept referenced until done)
+_SHADOW_TASKS: Set[asyncio.Task] = set()
 
-def run_workflow(store: VectorStore, request: AnalysisRequest) -> AnalysisResponse:
+
+def request_key(request: AnalysisRequest) -> str:
+    """Hash of the request fields that determine the analysis."""
+    scope = resolve_policy_scope(request)
+    normalized = {
+        "claim_text": " ".join(request.claim_text.split()).casefold(),
+        "policy_ids": sorted(scope) if scope is not None else None,
+        "jurisdiction": request.jurisdiction,
+        "claim_type": request.claim_type,
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def run_workflow(store: VectorStore, request: AnalysisRequest) -> AnalysisResponse:
+    """
+    Analyze a claim. Identical requests that arrive while one is already
+    running await that computation instead of starting their own.
+    """
+    key = request_key(request)
+    metrics.incr("analyze_requests_total")
+    task = _IN_FLIGHT.get(key)
+    if task is not None:
+        metrics.incr("analyze_coalesced_total")
+        logger.info("Coalescing duplicate analyze request key=%s", key[:12])
+    else:
+        task = asyncio.ensure_future(_run_workflow(store, request))
+        _IN_FLIGHT[key] = task
+        metrics.add("analyze_in_flight", 1)
+
+        def finished(done: asyncio.Task) -> None:
+            if _IN_FLIGHT.get(key) is done:
+                del _IN_FLIGHT[key]
+            metrics.add("analyze_in_flight", -1)
+            # Mark the error as seen even if every waiter has gone away
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(finished)
+
+    # A disconnecting client must not cancel the analysis for the others
+    return await asyncio.shield(task)
+
+
+async def _run_workflow(store: VectorStore, request: AnalysisRequest) -> AnalysisResponse:
+    label = f"policy_id={request.policy_id} key={request_key(request)[:12]}"
+    with trace_request(label), deadline_scope(settings.analyze_deadline_seconds):
+        response = await _traced_workflow(store, request)
+    metrics.incr(f"analyze_path_{response.path.replace('-', '_')}_total")
+    return response
+
+
+async def _traced_workflow(store: VectorStore, request: AnalysisRequest) -> AnalysisResponse:
     workflow = route_request(request)
     logger.debug("Routed workflow=%s policy_id=%s", workflow, request.policy_id)
 
@@ -26,21 +90,128 @@ def run_workflow(store: VectorStore, request: AnalysisRequest) -> AnalysisRespon
             citations=[],
         )
 
+    try:
+        with stage("retrieve"):
+            retrieved = await bounded("retrieve", retrieve_chunks(store, request))
+    except DeadlineExceeded:
+        logger.warning("Deadline exceeded during retrieval policy_id=%s", request.policy_id)
+        return AnalysisResponse(
+            decision="needs-review",
+            rationale="The analysis ran out of time before the policy could be searched.",
+            citations=[],
+            risk_level="high",
+            path="timeout",
+        )
+    logger.debug("Retrieved %d chunks", len(retrieved))
+
+    if settings.fast_path_enabled:
+        with stage("fast_path"):
+            fast = fast_path_response(request, retrieved)
+        if fast is not None:
+            metrics.incr("fast_path_hits_total")
+            logger.info("Fast path decision=%s", fast.decision)
+            if llm_enabled() and random.random() < settings.fast_path_shadow_rate:
+                _shadow_check(store, request, retrieved, fast)
+            return fast
+        metrics.incr("fast_path_misses_total")
+
+    return await _llm_workflow(store, request, retrieved)
+
+
+def _shadow_check(
+    store: VectorStore,
+    request: AnalysisRequest,
+    retrieved: List[Tuple[float, DocumentChunk]],
+    fast: AnalysisResponse,
+) -> None:
+    """Run the LLM workflow in the background and record whether it agrees."""
+
+    async def compare() -> None:
+        # Not part of the caller's request timings
+        untraced()
+        try:
+            full = await _llm_workflow(store, request, retrieved)
+        except Exception as e:
+            logger.warning(f"Fast path shadow check failed: {e}")
+            return
+        metrics.incr("fast_path_shadow_total")
+        if full.decision == fast.decision:
+            metrics.incr("fast_path_agree_total")
+        else:
+            logger.info(
+                "Fast path disagreement fast=%s llm=%s claim=%r",
+                fast.decision,
+                full.decision,
+                request.claim_text[:120],
+            )
+
+    task = asyncio.ensure_future(compare())
+    _SHADOW_TASKS.add(task)
+    task.add_done_callback(_SHADOW_TASKS.discard)
+
+
+def _retrieval_only(retrieved: List[Tuple[float, DocumentChunk]]) -> AnalysisResponse:
+    """Degraded answer when there is no time left for the LLM analyst."""
+    return AnalysisResponse(
+        decision="needs-review",
+        rationale=(
+            "The time budget ran out before the claim could be analyzed. "
+            "The most relevant policy clauses are attached for manual review."
+        ),
+        citations=retrieval_citations(retrieved),
+        risk_level="medium",
+        path="retrieval-only",
+    )
+
+
+async def _llm_workflow(
+    store: VectorStore,
+    request: AnalysisRequest,
+    retrieved: List[Tuple[float, DocumentChunk]],
+) -> AnalysisResponse:
+    """
+    Analyst, then critic, within the request deadline. Skips the critic
+    (keeping only citations that carry page metadata) or falls back to the
+    retrieved clauses when the remaining budget is too small for them.
+    """
+    if not has_budget(settings.analyst_min_budget_seconds):
+        logger.warning("Skipping analyst: not enough time budget left")
+        return _retrieval_only(retrieved)
+
     if settings.use_langgraph:
+        # langgraph pulls in langchain-core; only pay for it when enabled
+        from app.agents.langgraph_flow import run_langgraph
+
         logger.info("Running LangGraph workflow")
-        return run_langgraph(store, request)
+        try:
+            return await run_langgraph(store, request, retrieved)
+        except DeadlineExceeded as e:
+            logger.warning(str(e))
+            return _retrieval_only(retrieved)
 
     logger.info("Running standard workflow")
-    retrieved = retrieve_chunks(store, request)
-    logger.debug("Retrieved %d chunks", len(retrieved))
-    decision, rationale, citations, risk_level = analyze_claim(request, retrieved)
+    try:
+        decision, rationale, citations, risk_level = await analyze_claim(request, retrieved)
+    except DeadlineExceeded as e:
+        logger.warning(str(e))
+        return _retrieval_only(retrieved)
     logger.debug(
         "Analysis decision=%s citations=%d risk=%s",
         decision,
         len(citations),
         risk_level,
     )
-    verified = validate_citations(citations, retrieved)
+
+    path = "llm" if llm_enabled() else "retrieval-only"
+    if not has_budget(settings.critic_min_budget_seconds):
+        logger.warning("Skipping critic: not enough time budget left")
+        verified, path = await validate_citations(citations), "llm-no-critic"
+    else:
+        try:
+            verified = await validate_citations(citations, retrieved)
+        except DeadlineExceeded as e:
+            logger.warning(str(e))
+            verified, path = await validate_citations(citations), "llm-no-critic"
     logger.debug("Verified citations=%d", len(verified))
 
     return AnalysisResponse(
@@ -48,4 +219,5 @@ def run_workflow(store: VectorStore, request: AnalysisRequest) -> AnalysisRespon
         rationale=rationale,
         citations=verified,
         risk_level=risk_level,
+        path=path,
     )
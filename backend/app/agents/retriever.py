@@ -1,20 +1,54 @@
 from __future__ import annotations
 
 from typing import List, Tuple
+import asyncio
 
+from app.admission import embedder_gate
+from app.config import settings
 from app.ingestion.embeddings import embed_texts
+from app.profiling import stage
 from app.schemas.models import AnalysisRequest, DocumentChunk
+from app.state import get_clause_index
 from app.vectorstores.base import VectorStore
-from app.agents.self_query import build_metadata_filter
+from app.agents.self_query import build_metadata_filter, resolve_policy_scope
 
 
-def retrieve_chunks(
+async def retrieve_chunks(
     store: VectorStore,
     request: AnalysisRequest,
     top_k: int = 5,
 ) -> List[Tuple[float, DocumentChunk]]:
-    query_embedding = embed_texts([request.claim_text])[0]
+    # Embedding is CPU-bound; keep it off the event loop
+    async with embedder_gate.hold():
+        with stage("embed_query"):
+            query_embedding = (await asyncio.to_thread(embed_texts, [request.claim_text]))[0]
 
     metadata_filter = build_metadata_filter(request)
+    policy_ids = resolve_policy_scope(request)
 
-    return store.query(query_embedding, top_k=top_k, metadata_filter=metadata_filter)
+    search = store.aquery(
+        query_embedding,
+        top_k=top_k,
+        metadata_filter=metadata_filter,
+        policy_ids=policy_ids,
+    )
+    if settings.clause_index_per_kind <= 0:
+        with stage("vector_search"):
+            return await search
+
+    # Exclusion/limit/definition clauses of the scoped policies (or of the
+    # whole catalog for a global search), so the analyst can check them
+    # even when vector search ranks them low
+    with stage("vector_search"):
+        retrieved, clauses = await asyncio.gather(
+            search,
+            asyncio.to_thread(
+                get_clause_index().lookup,
+                query_embedding,
+                policy_ids,
+                settings.clause_index_per_kind,
+                metadata_filter,
+            ),
+        )
+    seen = {chunk.id for _, chunk in retrieved}
+    return retrieved + [(score, chunk) for score, chunk in clauses if chunk.id not in seen]
@@ -1,6 +1,46 @@
 from __future__ import annotations
 
-from app.schemas.models import AnalysisRequest
+from typing import List, Optional, Tuple
+import re
+
+from app.config import settings
+from app.agents.self_query import resolve_policy_scope
+from app.ingestion.parser import clause_kind
+from app.schemas.models import AnalysisRequest, AnalysisResponse, Citation, DocumentChunk
+
+# Standard exclusions that can be recognized lexically: (claim cues, clause
+# cues). A claim cue must appear in the claim and a clause cue in a
+# retrieved clause from the exclusions section of the claim's policy.
+_EXCLUSION_CUES = {
+    "hazardous activity": (
+        r"sky ?diving|parachut\w*|bungee|hang ?gliding|paragliding|scuba|white water rafting"
+        r"|mountain(eering| climbing)|motor ?racing",
+        r"hazardous activit\w*|sky ?diving|adventure sports?",
+    ),
+    "cosmetic surgery": (
+        r"cosmetic|plastic surgery|rhinoplasty|liposuction|facelift|breast augmentation"
+        r"|(improve|enhance)\w* (my |the )?(overall )?(physical )?appearance",
+        r"cosmetic|plastic surgery",
+    ),
+    "alcohol or drug abuse": (
+        r"under the influence|intoxicat\w*|drunk\w*|alcohol|drug abuse|overdose",
+        r"alcohol|drug abuse|intoxicat\w*",
+    ),
+    "spondylosis/spondylitis": (r"spond[yi]l\w*", r"spond[yi]l\w*"),
+    "self-inflicted injury": (r"self[- ]inflicted|attempted suicide", r"self[- ]inflicted"),
+    "alternative medicine": (
+        r"ayurved\w*|homeopath\w*|naturopath\w*",
+        r"ayurved\w*|homeopath\w*|naturopath\w*",
+    ),
+}
+
+# A cue right after one of these is not a positive statement
+_NEGATION = re.compile(r"\b(not|no|never|without|wasn't|weren't|non)\b(\W+\w+){0,3}\W*$", re.IGNORECASE)
+# ...nor one followed by these ("blood alcohol test came back negative")
+_NEGATION_AFTER = re.compile(
+    r"^\W*(\w+\W+){0,5}?(negative|ruled out|not (involved|detected|found|present|a factor)|absent|unrelated)\b",
+    re.IGNORECASE,
+)
 
 
 def route_request(request: AnalysisRequest) -> str:
@@ -9,3 +49,74 @@ def route_request(request: AnalysisRequest) -> str:
     For now, all requests go to policy analysis.
     """
     return "policy_analysis"
+
+
+def _positive_match(pattern: str, text: str) -> Optional[re.Match]:
+    """The first mention of the cue, or None if there is none or any mention is negated."""
+    matches = list(re.finditer(pattern, text, re.IGNORECASE))
+    for match in matches:
+        before = text[max(0, match.start() - 40) : match.start()]
+        after = text[match.end() : match.end() + 60]
+        if _NEGATION.search(before) or _NEGATION_AFTER.search(after):
+            return None
+    return matches[0] if matches else None
+
+
+def _sentence_around(text: str, start: int, end: int) -> str:
+    left = max(text.rfind(".", 0, start), text.rfind(";", 0, start)) + 1
+    right_candidates = [i for i in (text.find(".", end), text.find(";", end)) if i != -1]
+    right = min(right_candidates) + 1 if right_candidates else len(text)
+    return " ".join(text[left:right].split())
+
+
+def fast_path_response(
+    request: AnalysisRequest,
+    retrieved: List[Tuple[float, DocumentChunk]],
+) -> Optional[AnalysisResponse]:
+    """
+    Local classifier for clear-cut exclusions. Returns a complete response
+    when the claim names a standard excluded activity/treatment and a
+    retrieved clause from the exclusions section of the claim's policy
+    (scoring at least settings.fast_path_min_score) names it too. Anything
+    less certain (a negated mention, no single policy in scope) returns
+    None, and the claim goes through the LLM workflow.
+    """
+    scope = resolve_policy_scope(request)
+    if scope is None or len(scope) != 1:
+        # Global or multi-policy search: an exclusion of another policy says nothing
+        return None
+    for concept, (claim_cue, clause_cue) in _EXCLUSION_CUES.items():
+        claim_match = _positive_match(claim_cue, request.claim_text)
+        if claim_match is None:
+            continue
+        for score, chunk in retrieved:
+            if (
+                score < settings.fast_path_min_score
+                or chunk.metadata.policy_id != scope[0]
+                or clause_kind(chunk.metadata.section) != "exclusion"
+            ):
+                continue
+            clause_match = re.search(clause_cue, chunk.text, re.IGNORECASE)
+            if clause_match is None:
+                continue
+            quote = _sentence_around(chunk.text, clause_match.start(), clause_match.end())
+            return AnalysisResponse(
+                decision="excluded",
+                rationale=(
+                    f'The claim involves {concept} ("{claim_match.group(0)}"), which the '
+                    f"policy excludes: \"{quote}\" ({chunk.metadata.source_filename}, "
+                    f"page {chunk.metadata.page_number})."
+                ),
+                citations=[
+                    Citation(
+                        quote=quote[:400],
+                        page_number=chunk.metadata.page_number,
+                        source_filename=chunk.metadata.source_filename,
+                        policy_id=chunk.metadata.policy_id,
+                        text=chunk.text,
+                    )
+                ],
+                risk_level="high",
+                path="fast-path",
+            )
+    return None
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-from typing import Dict
+from typing import Dict, List, Optional
 
 from app.schemas.models import AnalysisRequest
 
+# policy_id sent by clients that want to search every ingested policy
+GLOBAL_POLICY_ID = "global"
+
 
 def build_metadata_filter(request: AnalysisRequest) -> Dict[str, str]:
     metadata_filter: Dict[str, str] = {}
@@ -15,3 +18,15 @@ def build_metadata_filter(request: AnalysisRequest) -> Dict[str, str]:
         metadata_filter["claim_type"] = request.claim_type
 
     return metadata_filter
+
+
+def resolve_policy_scope(request: AnalysisRequest) -> Optional[List[str]]:
+    """
+    Policies to search for this request, or None to search the whole corpus.
+    An explicit policy_ids list wins over policy_id.
+    """
+    if request.policy_ids:
+        return list(dict.fromkeys(request.policy_ids))
+    if request.policy_id and request.policy_id != GLOBAL_POLICY_ID:
+        return [request.policy_id]
+    return None
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+from app.ingestion.parser import clause_kind
+from app.schemas.models import ChunkMetadata, DocumentChunk, PolicySummary
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS policies (
+    policy_id TEXT PRIMARY KEY,
+    source_filename TEXT,
+    jurisdiction TEXT,
+    claim_type TEXT,
+    chunks_indexed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS pages (
+    policy_id TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (policy_id, page_number)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    policy_id TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    metadata TEXT NOT NULL,
+    text BLOB NOT NULL,
+    embedding BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_by_policy ON chunks (policy_id);
+CREATE TABLE IF NOT EXISTS clauses (
+    chunk_id TEXT PRIMARY KEY,
+    policy_id TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clauses_by_policy ON clauses (policy_id);
+"""
+
+
+def _row_to_summary(row: sqlite3.Row) -> PolicySummary:
+    return PolicySummary(
+        policy_id=row["policy_id"],
+        source_filename=row["source_filename"],
+        jurisdiction=row["jurisdiction"],
+        claim_type=row["claim_type"],
+        chunks_indexed=row["chunks_indexed"],
+    )
+
+
+def _row_to_chunk(row: sqlite3.Row) -> DocumentChunk:
+    return DocumentChunk(
+        id=row["chunk_id"],
+        text=zlib.decompress(row["text"]).decode("utf-8"),
+        metadata=ChunkMetadata(**json.loads(row["metadata"])),
+    )
+
+
+class CatalogTransaction:
+    """
+    Writes for one ingest; committed together or not at all. They are
+    buffered while the ingest parses and embeds, and applied in one short
+    write transaction at the end, so the database write lock is never held
+    across slow work.
+    """
+
+    def __init__(self) -> None:
+        self._statements: List[Tuple[str, Any]] = []
+        self._page_digests: Dict[Tuple[str, int], Any] = {}
+
+    def replace_policy(self, policy_id: str) -> None:
+        """Drop a policy's previous chunks and pages before it is re-ingested."""
+        self._statements.append(("DELETE FROM chunks WHERE policy_id = ?", [(policy_id,)]))
+        self._statements.append(("DELETE FROM pages WHERE policy_id = ?", [(policy_id,)]))
+        self._statements.append(("DELETE FROM clauses WHERE policy_id = ?", [(policy_id,)]))
+
+    def delete_policy(self, policy_id: str) -> None:
+        """Remove a policy: its summary, chunks, pages and clauses."""
+        self.replace_policy(policy_id)
+        self._statements.append(("DELETE FROM policies WHERE policy_id = ?", [(policy_id,)]))
+
+    def add_chunks(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
+        rows = []
+        clauses = []
+        for embedding, chunk in zip(embeddings, chunks):
+            meta = chunk.metadata
+            kind = clause_kind(meta.section)
+            if kind:
+                clauses.append((chunk.id, meta.policy_id, kind))
+            rows.append(
+                (
+                    chunk.id,
+                    meta.policy_id,
+                    meta.page_number,
+                    meta.model_dump_json(exclude_none=True),
+                    zlib.compress(chunk.text.encode("utf-8")),
+                    np.asarray(embedding, dtype=np.float32).tobytes(),
+                )
+            )
+            key = (meta.policy_id, meta.page_number)
+            self._page_digests.setdefault(key, hashlib.sha256()).update(chunk.text.encode("utf-8"))
+        self._statements.append(("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)", rows))
+        self._statements.append(("INSERT OR REPLACE INTO clauses VALUES (?, ?, ?)", clauses))
+
+    def upsert_policy(self, summary: PolicySummary) -> None:
+        self._statements.append(
+            (
+                "INSERT OR REPLACE INTO policies VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        summary.policy_id,
+                        summary.source_filename,
+                        summary.jurisdiction,
+                        summary.claim_type,
+                        summary.chunks_indexed,
+                    )
+                ],
+            )
+        )
+
+    def _apply(self, conn: sqlite3.Connection) -> None:
+        for statement, rows in self._statements:
+            conn.executemany(statement, rows)
+        conn.executemany(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+            [
+                (policy_id, page, digest.hexdigest())
+                for (policy_id, page), digest in self._page_digests.items()
+            ],
+        )
+
+
+class Catalog:
+    """
+    Durable record of ingested policies and their chunks (SQLite, WAL mode).
+
+    Holds each policy's summary, a content hash per page, and every chunk's
+    ID, metadata, compressed text and embedding, so the registry and local
+    indexes can be rebuilt on startup without re-parsing or re-embedding.
+    """
+
+    def __init__(self, path: str) -> None:
+        # Separate reader and writer connections: WAL lets reads proceed
+        # while an ingest transaction is open.
+        self._conn = self._connect(path)
+        self._writer = self._connect(path)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        has_clauses = self._writer.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clauses'"
+        ).fetchone()
+        self._writer.executescript(_SCHEMA)
+        if not has_clauses:
+            self._backfill_clauses()
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def _backfill_clauses(self) -> None:
+        """Classify chunks ingested before the clauses table existed."""
+        self._writer.create_function("clause_kind", 1, clause_kind, deterministic=True)
+        self._writer.execute(
+            """
+            INSERT OR IGNORE INTO clauses
+            SELECT chunk_id, policy_id, clause_kind(json_extract(metadata, '$.section')) AS kind
+            FROM chunks WHERE kind IS NOT NULL
+            """
+        )
+
+    def _commit(self, tx: CatalogTransaction) -> None:
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                tx._apply(self._writer)
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self) -> Iterator[CatalogTransaction]:
+        """Buffer writes; they are committed if the block exits normally."""
+        tx = CatalogTransaction()
+        yield tx
+        self._commit(tx)
+
+    @asynccontextmanager
+    async def atransaction(self) -> AsyncIterator[CatalogTransaction]:
+        """transaction() for coroutines: the commit runs on a worker thread."""
+        tx = CatalogTransaction()
+        yield tx
+        await asyncio.to_thread(self._commit, tx)
+
+    def list_policies(self) -> List[PolicySummary]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM policies ORDER BY policy_id").fetchall()
+        return [_row_to_summary(row) for row in rows]
+
+    def get_policy(self, policy_id: str) -> Optional[PolicySummary]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM policies WHERE policy_id = ?", (policy_id,)
+            ).fetchone()
+        return _row_to_summary(row) if row else None
+
+    def page_hashes(self, policy_id: str) -> dict[int, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_number, content_hash FROM pages WHERE policy_id = ?",
+                (policy_id,),
+            ).fetchall()
+        return {row["page_number"]: row["content_hash"] for row in rows}
+
+    def chunk_ids(self, policy_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE policy_id = ?", (policy_id,)
+            ).fetchall()
+        return [row["chunk_id"] for row in rows]
+
+    def get_chunks(self, chunk_ids: List[str]) -> Dict[str, DocumentChunk]:
+        """Chunks by ID (text and full metadata); unknown IDs are left out."""
+        found: Dict[str, DocumentChunk] = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                ).fetchall()
+            for row in rows:
+                found[row["chunk_id"]] = _row_to_chunk(row)
+        return found
+
+    def data_version(self) -> int:
+        """Changes whenever another connection or process commits."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def policy_clauses(
+        self, policy_id: str
+    ) -> Tuple[List[str], List[List[float]], List[DocumentChunk]]:
+        """(kinds, embeddings, chunks) of a policy's indexed clauses."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT clauses.kind, chunks.* FROM clauses
+                JOIN chunks USING (chunk_id)
+                WHERE clauses.policy_id = ?
+                ORDER BY chunk_id
+                """,
+                (policy_id,),
+            ).fetchall()
+        kinds = [row["kind"] for row in rows]
+        embeddings = [np.frombuffer(row["embedding"], dtype=np.float32) for row in rows]
+        return kinds, embeddings, [_row_to_chunk(row) for row in rows]
+
+    def iter_chunks(
+        self, batch_size: int = 1000, policy_id: Optional[str] = None
+    ) -> Iterator[Tuple[List[List[float]], List[DocumentChunk]]]:
+        """Yield (embeddings, chunks) batches of every stored chunk, or of one policy's."""
+        last_id = ""
+        scope = "" if policy_id is None else " AND policy_id = ?"
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM chunks WHERE chunk_id > ?{scope} ORDER BY chunk_id LIMIT ?",
+                    (last_id, *(() if policy_id is None else (policy_id,)), batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]["chunk_id"]
+            embeddings = [np.frombuffer(row["embedding"], dtype=np.float32) for row in rows]
+            yield embeddings, [_row_to_chunk(row) for row in rows]
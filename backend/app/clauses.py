@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import threading
+
+import numpy as np
+
+from app.catalog import Catalog
+from app.schemas.models import DocumentChunk
+from app.vectorstores.base import page_number_filter
+from app.vectorstores.matrix import normalize
+
+# Policies whose clauses are kept decoded in memory at once
+_MAX_CACHED_POLICIES = 512
+
+
+@dataclass
+class _PolicyClauses:
+    kinds: np.ndarray
+    matrix: np.ndarray
+    chunks: List[DocumentChunk]
+
+
+class ClauseIndex:
+    """
+    Exclusion, limit and definition clauses of each policy, as classified at
+    ingest and stored in the catalog.
+
+    A scoped query loads the policy's clauses once (one indexed SELECT) and
+    ranks them against the claim with a small in-memory dot product, so the
+    analyst sees the best clause of each kind whatever the vector store
+    returned. A global query ranks the clauses of every catalogued policy
+    and keeps the best of each kind overall. Independent of the store backend.
+    """
+
+    def __init__(self, catalog: Catalog) -> None:
+        self._catalog = catalog
+        self._cache: OrderedDict[str, _PolicyClauses] = OrderedDict()
+        self._version: int | None = None
+        self._lock = threading.Lock()
+
+    def _get(self, policy_id: str) -> _PolicyClauses:
+        # Any commit to the catalog (from any worker) invalidates the cache
+        version = self._catalog.data_version()
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+            cached = self._cache.get(policy_id)
+            if cached is not None:
+                self._cache.move_to_end(policy_id)
+                return cached
+
+        kinds, embeddings, chunks = self._catalog.policy_clauses(policy_id)
+        clauses = _PolicyClauses(
+            kinds=np.asarray(kinds, dtype=object),
+            # (0, 0) when the policy has no clauses (or does not exist)
+            matrix=normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(chunks), -1 if chunks else 0)),
+            chunks=chunks,
+        )
+        with self._lock:
+            self._cache[policy_id] = clauses
+            while len(self._cache) > _MAX_CACHED_POLICIES:
+                self._cache.popitem(last=False)
+        return clauses
+
+    def lookup(
+        self,
+        query_embedding: List[float],
+        policy_ids: Optional[List[str]],
+        per_kind: int = 1,
+        metadata_filter: Optional[Dict[str, str]] = None,
+    ) -> List[Tuple[float, DocumentChunk]]:
+        """
+        Top per_kind clauses of each kind for each policy, best first.
+        policy_ids=None searches the whole catalog and returns the top
+        per_kind of each kind across all policies.
+        """
+        if per_kind <= 0:
+            return []
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        if metadata_filter:
+            metadata_filter = {
+                key: page_number_filter(value) if key == "page_number" else value
+                for key, value in metadata_filter.items()
+            }
+        if policy_ids is None:
+            policy_ids = [summary.policy_id for summary in self._catalog.list_policies()]
+            cap = per_kind
+        else:
+            cap = None
+
+        results: List[Tuple[float, str, DocumentChunk]] = []
+        for policy_id in policy_ids:
+            clauses = self._get(policy_id)
+            if not clauses.chunks:
+                continue
+            scores = clauses.matrix @ query
+            for kind in np.unique(clauses.kinds):
+                rows = np.flatnonzero(clauses.kinds == kind)
+                if metadata_filter:
+                    rows = rows[
+                        [
+                            all(
+                                getattr(clauses.chunks[row].metadata, key, None) == value
+                                for key, value in metadata_filter.items()
+                            )
+                            for row in rows
+                        ]
+                    ]
+                for row in rows[np.argsort(-scores[rows])][:per_kind]:
+                    results.append((float(scores[row]), kind, clauses.chunks[row]))
+
+        results.sort(key=lambda item: item[0], reverse=True)
+        if cap is not None:
+            counts: Dict[str, int] = {}
+            kept = []
+            for item in results:
+                counts[item[1]] = counts.get(item[1], 0) + 1
+                if counts[item[1]] <= cap:
+                    kept.append(item)
+            results = kept
+        return [(score, chunk) for score, _, chunk in results]
@@ -9,19 +9,104 @@ class Settings(BaseSettings):
     embeddings_provider: str = "sentence-transformers"  # hash | sentence-transformers
     embeddings_dim: int = 384
     embeddings_model: str = "BAAI/bge-small-en-v1.5"
+    # ONNX intra-op threads per model instance (None = onnxruntime default)
+    embeddings_threads: int | None = None
+    embeddings_batch_size: int = 256
+    # Worker processes for data-parallel embedding (None = off, 0 = one per core)
+    embeddings_parallel: int | None = None
+    # Batches smaller than this are embedded in-process even in parallel mode
+    embeddings_parallel_min_batch: int = 256
 
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    ingest_batch_size: int = 50
+    # Exclusion/limit/definition clauses added to each scoped query, per kind
+    clause_index_per_kind: int = 1
 
+    # pinecone | memory | shared | sharded | chroma
     vector_store: str = "pinecone"
+    # In-memory store vector encoding: none (float32) | float16 | int8
+    vector_store_quantization: str = "none"
+    # Shortlist size multiplier for exact rescoring of quantized scores
+    vector_store_rescore_factor: int = 4
+    # Where full-precision rows for rescoring are kept (None = system temp dir)
+    vector_store_rescore_dir: str | None = None
+    # Local stores rebuild their rows in the background once this share is deleted
+    vector_store_compact_ratio: float = 0.25
+    # Opt-in two-stage search (policy, then section centroids) once the
+    # searched partitions hold this many rows (None = exact scan of every row)
+    vector_store_centroid_min_rows: int | None = None
+    # Best policies, then best sections, whose rows the second stage scans
+    vector_store_probe_policies: int = 16
+    vector_store_probe_sections: int = 8
+    # A stage only prunes if its best centroid outscores the first skipped one by this
+    vector_store_centroid_min_gap: float = 0.05
+    # Memory-mapped index shared by all uvicorn workers (vector_store="shared")
+    shared_store_dir: str = "./shared_index"
+    # Worker processes of the sharded local store (vector_store="sharded"; None = one per core)
+    sharded_store_shards: int | None = None
+    # SQLite catalog of ingested policies and chunks (survives restarts)
+    catalog_path: str = "./catalog.db"
+    # Embedded persistent Chroma collection (vector_store="chroma")
     chroma_persist_dir: str = "./chroma"
     chroma_collection: str = "smart-underwriter"
 
     pinecone_api_key: str | None = None
     pinecone_index: str | None = None
     pinecone_env: str | None = None
+    pinecone_pool_threads: int = 8
+    pinecone_upsert_batch_size: int = 100
+    pinecone_max_request_bytes: int = 2_000_000
+    pinecone_upsert_retries: int = 4
+    pinecone_retry_backoff: float = 0.5
+    # Seconds the namespace list read from index stats is reused by unscoped
+    # queries (other processes add and delete namespaces too)
+    pinecone_namespace_ttl: float = 60.0
+    # One namespace for every policy, scoped by a policy_id metadata filter, so
+    # a global query is a single request (default: a namespace per policy)
+    pinecone_namespace: str | None = None
+    # Most namespaces an unscoped query may fan out to with per-policy namespaces
+    pinecone_max_fanout: int = 50
 
     use_langgraph: bool = False
+    # Answer clear-cut exclusions locally, without the LLM calls
+    fast_path_enabled: bool = True
+    # Minimum retrieval score of the exclusion clause a fast-path match relies on
+    fast_path_min_score: float = 0.3
+    # Fraction of fast-path answers re-checked by the LLM workflow in the background
+    fast_path_shadow_rate: float = 0.1
+
+    # Admission control: concurrent requests per endpoint, how many may wait
+    # (beyond that -> 429), and how long they may wait (then -> 503)
+    analyze_max_concurrency: int = 16
+    analyze_max_queue: int = 64
+    analyze_queue_timeout: float = 10.0
+    ingest_max_concurrency: int = 2
+    ingest_max_queue: int = 4
+    ingest_queue_timeout: float = 30.0
+    # Concurrent embed / LLM calls; /analyze is served before /ingest
+    embedder_max_concurrency: int = 2
+    llm_max_concurrency: int = 8
+
+    # Time budget of one analysis; the workflow degrades rather than overrun it
+    analyze_deadline_seconds: float = 30.0
+    # Below this much remaining budget, skip the LLM analyst / the critic
+    analyst_min_budget_seconds: float = 4.0
+    critic_min_budget_seconds: float = 4.0
+    # Duplicate a slow LLM call after this latency percentile (initial delay
+    # until enough calls have been observed)
+    llm_hedge_enabled: bool = True
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_initial_delay: float = 8.0
+
+    # Enables the /admin endpoints (sent as X-Admin-Token); None = disabled
+    admin_token: str | None = None
+    # Analyses slower than this are kept with a per-stage breakdown
+    slow_request_threshold_seconds: float = 10.0
+    slow_request_log_size: int = 100
+
+    # Load and warm the embedding model in the background at startup
+    warmup_on_startup: bool = True
 
     class Config:
         env_file = (".env", "../.env")
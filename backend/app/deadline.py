@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Iterator, Optional, Set, TypeVar
+import asyncio
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.metrics import metrics
+
+T = TypeVar("T")
+
+# Latency samples needed before hedging uses the observed percentile
+_MIN_SAMPLES = 20
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out while waiting on `stage`."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """Give the enclosed work (and tasks it starts) a time budget."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None when there is none."""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def has_budget(seconds: float) -> bool:
+    left = remaining()
+    return left is None or left >= seconds
+
+
+async def bounded(stage: str, awaitable: Awaitable[T]) -> T:
+    """Await within the remaining budget; raise DeadlineExceeded otherwise."""
+    try:
+        return await asyncio.wait_for(awaitable, remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage) from None
+
+
+class _Latencies:
+    def __init__(self) -> None:
+        self._samples: Deque[float] = deque(maxlen=500)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def hedge_delay(self) -> float:
+        if len(self._samples) < _MIN_SAMPLES:
+            return settings.llm_hedge_initial_delay
+        return float(np.percentile(self._samples, settings.llm_hedge_percentile))
+
+
+_latencies: Dict[str, _Latencies] = {}
+
+
+async def hedged(name: str, call: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run call(); if it has not answered after the usual (percentile) latency
+    of `name`, start a duplicate and take whichever finishes first. Bounded
+    by the request deadline; the losing attempt is cancelled.
+    """
+    latencies = _latencies.setdefault(name, _Latencies())
+    started = time.monotonic()
+    first = asyncio.ensure_future(call())
+    pending: Set[asyncio.Future] = {first}
+    failure: Optional[BaseException] = None
+    try:
+        if settings.llm_hedge_enabled:
+            delay = latencies.hedge_delay()
+            left = remaining()
+            if left is None or delay < left:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    metrics.incr(f"{name}_hedges_total")
+                    pending.add(asyncio.ensure_future(call()))
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining(), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                raise DeadlineExceeded(name)
+            for attempt in done:
+                if attempt.exception() is None:
+                    if attempt is first:
+                        # Only the primary's own latency sets the hedge delay; a
+                        # hedge's time says nothing about how long calls take
+                        latencies.record(time.monotonic() - started)
+                    else:
+                        metrics.incr(f"{name}_hedge_wins_total")
+                    return attempt.result()
+                failure = failure or attempt.exception()
+        if failure is None:
+            raise RuntimeError(f"{name}: every attempt ended without a result")
+        raise failure
+    finally:
+        for attempt in pending:
+            attempt.cancel()
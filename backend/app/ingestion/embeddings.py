@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 from typing import List
+from concurrent.futures import ProcessPoolExecutor
 import hashlib
 import logging
+import multiprocessing
+import os
+import threading
 from functools import lru_cache
 
 from app.config import settings
@@ -11,11 +15,21 @@ logger = logging.getLogger(__name__)
 
 # Global model variable
 _model = None
+_model_lock = threading.Lock()
+_ready = threading.Event()
+_warmup_error: str | None = None
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
 
 def get_model():
     """Lazy load the fastembed model."""
     global _model
-    if _model is None:
+    if _model is not None:
+        return _model
+    # Background warm-up and the first request may race to load the model
+    with _model_lock:
+        if _model is not None:
+            return _model
         try:
             from fastembed import TextEmbedding
             # FastEmbed uses slightly different model names, but "BAAI/bge-small-en-v1.5" or similar are good.
@@ -25,12 +39,93 @@ def get_model():
             # "BAAI/bge-small-en-v1.5" is great, but let's stick to what we had if possible, or close to it.
             # FastEmbed defaults to "BAAI/bge-small-en-v1.5" which is 384 dim, same as all-MiniLM-L6-v2.
             logger.info(f"Loading embedding model (FastEmbed): {settings.embeddings_model}")
-            _model = TextEmbedding(model_name=settings.embeddings_model)
+            _model = TextEmbedding(
+                model_name=settings.embeddings_model,
+                threads=settings.embeddings_threads,
+            )
         except ImportError:
             logger.error("fastembed not installed. Please install it with: pip install fastembed")
             raise
     return _model
 
+def _parallel_workers() -> int:
+    if settings.embeddings_parallel is None:
+        return 0
+    return settings.embeddings_parallel or os.cpu_count() or 1
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    """Runs once per worker process: each worker holds its own model."""
+    global _model
+    from fastembed import TextEmbedding
+
+    _model = TextEmbedding(model_name=model_name, threads=threads)
+
+
+def _embed_shard(texts: List[str], batch_size: int) -> List[List[float]]:
+    return [e.tolist() for e in _model.embed(texts, batch_size=batch_size)]
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Persistent worker pool for data-parallel embedding of large batches."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = _parallel_workers()
+            # Split the cores between workers unless threads are pinned explicitly
+            threads = settings.embeddings_threads or max(1, (os.cpu_count() or 1) // workers)
+            logger.info(
+                f"Starting {workers} embedding workers ({threads} ONNX threads each)"
+            )
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                # spawn: forking after onnxruntime has started threads is unsafe
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.embeddings_model, threads),
+            )
+    return _pool
+
+
+def _embed_parallel(texts: List[str]) -> List[List[float]]:
+    workers = _parallel_workers()
+    shard_size = -(-len(texts) // workers)
+    shards = [texts[i : i + shard_size] for i in range(0, len(texts), shard_size)]
+    pool = get_pool()
+    futures = [
+        pool.submit(_embed_shard, shard, settings.embeddings_batch_size)
+        for shard in shards
+    ]
+    embeddings: List[List[float]] = []
+    for future in futures:
+        embeddings.extend(future.result())
+    return embeddings
+
+
+def warm_up() -> None:
+    """Load the model and run one inference so the ONNX graph is compiled."""
+    global _warmup_error
+    try:
+        embed_texts(["warmup"])
+        logger.info("Embedding model warmed up")
+    except Exception as e:
+        _warmup_error = str(e)
+        logger.error(f"Failed to warm up embedding model: {e}")
+
+
+def start_warmup() -> threading.Thread:
+    """Warm the embedder on a daemon thread so startup is not blocked."""
+    thread = threading.Thread(target=warm_up, name="embedder-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def embedder_status() -> str:
+    if _ready.is_set():
+        return "ready"
+    return "failed" if _warmup_error else "warming"
+
+
 def _hash_to_vector(text: str, dim: int = 8) -> List[float]:
     """Legacy hash-based embeddings for testing."""
     digest = hashlib.sha256(text.encode("utf-8")).digest()
@@ -44,12 +139,23 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
     Generate embeddings for a list of texts.
     Supports 'sentence-transformers' (mapped to FastEmbed) and 'hash' (deterministic/random).
     """
-    if settings.embeddings_provider == "sentence-transformers":
+    if (
+        settings.embeddings_provider == "sentence-transformers"
+        and _parallel_workers() > 1
+        and len(texts) >= settings.embeddings_parallel_min_batch
+    ):
+        # Large ingest batches are sharded across worker processes
+        embeddings = _embed_parallel(texts)
+    elif settings.embeddings_provider == "sentence-transformers":
         model = get_model()
         # FastEmbed returns a generator of numpy arrays
-        embeddings_generator = model.embed(texts)
-        return [e.tolist() for e in embeddings_generator]
-    
-    # Fallback/Legacy hash embeddings
-    dim = max(1, int(settings.embeddings_dim))
-    return [_hash_to_vector(text, dim=dim) for text in texts]
+        embeddings_generator = model.embed(texts, batch_size=settings.embeddings_batch_size)
+        embeddings = [e.tolist() for e in embeddings_generator]
+    else:
+        # Fallback/Legacy hash embeddings
+        dim = max(1, int(settings.embeddings_dim))
+        embeddings = [_hash_to_vector(text, dim=dim) for text in texts]
+
+    # The first successful call means the model is loaded and compiled
+    _ready.set()
+    return embeddings
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+from bisect import bisect_right
+from collections import Counter
 from typing import List, Optional, Tuple, Generator
 import os
 import re
-import fitz  # PyMuPDF
 
 from app.schemas.models import ChunkMetadata, DocumentChunk
 from app.config import settings
@@ -51,11 +52,27 @@ def _recursive_split(text: str, chunk_size: int, overlap: int) -> List[str]:
     # If no separator works, hard split
     return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size-overlap)]
 
+def _has_reference_code(text: str) -> bool:
+    """Registration numbers like UIN: TATHLIP21255V022021 (letters and 4+ digits)."""
+    return any(
+        any(c.isalpha() for c in token) and sum(c.isdigit() for c in token) >= 4
+        for token in re.findall(r"\w+", text)
+    )
+
+# Words left lowercase in a title-case heading
+_MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+
+def _is_title_case(text: str) -> bool:
+    words = re.findall(r"[A-Za-z][A-Za-z'-]*", text)
+    return bool(words) and all(w[0].isupper() or w.lower() in _MINOR_WORDS for w in words)
+
 def _detect_section(text: str, font_size: float, current_section: str) -> str:
     """Detect if a text block is likely a section header based on properties."""
     # Simple heuristic: Short lines, uppercase or title case, large font (optional check)
     clean_text = text.strip()
-    if not clean_text:
+    if not clean_text or _has_reference_code(clean_text):
+        # UIN/CIN lines are all caps but never headers
         return current_section
         
     # Heuristic for section headers in insurance policies
@@ -65,32 +82,94 @@ def _detect_section(text: str, font_size: float, current_section: str) -> str:
     if clean_text.isupper() and len(clean_text) < 50 and len(clean_text) > 3:
         is_header = True
     
-    # Title case headers with specific keywords
+    # Title case headers with specific keywords: "Part B: General Exclusions",
+    # "4. Benefit Provisions", "Exclusions:". A wrapped sentence line that
+    # happens to hold a keyword ("Coverage would not be available for ...")
+    # is not title case, or neither starts with the keyword nor has a colon.
     keywords = ["Section", "Part", "Chapter", "Article", "Coverage", "Exclusion", "Definition", "Benefit", "Condition"]
-    if any(k in clean_text for k in keywords) and len(clean_text) < 60:
+    if (
+        any(k in clean_text for k in keywords)
+        and len(clean_text) < 60
+        and _is_title_case(clean_text)
+        and (
+            ":" in clean_text
+            or re.match(rf"(\d+(\.\d+)*\.?\s+)?({'|'.join(keywords)})\w*\s+\S", clean_text)
+        )
+    ):
         is_header = True
         
     return clean_text if is_header else current_section
 
+# Section-label cues for the clause kinds the analyst checks explicitly
+_CLAUSE_KINDS = {
+    "exclusion": ("EXCLUSION", "NOT COVERED", "NOT PAYABLE"),
+    "limit": ("LIMIT", "WAITING PERIOD", "CO-PAY", "COPAY", "DEDUCTIBLE", "SUB-LIMIT"),
+    "definition": ("DEFINITION", "MEANING OF"),
+}
+
+
+def clause_kind(section: str | None) -> str | None:
+    """Map a detected section header to exclusion | limit | definition."""
+    if not section:
+        return None
+    label = section.upper()
+    for kind, cues in _CLAUSE_KINDS.items():
+        if any(cue in label for cue in cues):
+            return kind
+    return None
+
+# Fraction of the page height at the top and bottom holding running headers/footers
+_MARGIN_BAND = 0.08
+# A header-like line repeated on this many pages, and on most pages so far, is running
+_RUNNING_MIN_PAGES = 3
+
+
+def _is_running_header(
+    bbox: Tuple[float, float, float, float],
+    page_height: float,
+    pages_with_text: int,
+    pages_so_far: int,
+) -> bool:
+    """A running header/footer (e.g. the UIN line) rather than a new section."""
+    band = page_height * _MARGIN_BAND
+    if bbox[3] <= band or bbox[1] >= page_height - band:
+        return True
+    return pages_with_text >= _RUNNING_MIN_PAGES and pages_with_text > pages_so_far / 2
+
 def parse_pdf(
     file_path: str,
     policy_id: str,
     jurisdiction: str | None = None,
     claim_type: str | None = None,
+    chunk_size: int | None = None,
+    chunk_overlap: int | None = None,
 ) -> Generator[DocumentChunk, None, None]:
     """
     Parse a PDF file from disk and yield DocumentChunk objects one by one.
     This avoids loading the entire PDF and all chunks into memory at once.
+    chunk_size/chunk_overlap default to the configured settings.
     """
+    chunk_size = chunk_size or settings.chunk_size
+    chunk_overlap = settings.chunk_overlap if chunk_overlap is None else chunk_overlap
+    import fitz  # PyMuPDF, imported lazily to keep API startup fast
+
     doc = fitz.open(file_path)
     
     current_section = "General"
+    # Pages each header-like line has appeared on so far
+    header_pages: Counter[str] = Counter()
     
     # improved text extraction with layout analysis
     for page_index in range(len(doc)):
         page = doc[page_index]
         blocks = page.get_text("dict")["blocks"]
+        page_height = page.rect.height
         page_text = ""
+        page_headers: set[str] = set()
+        # (offset in page_text, section from there on): a chunk gets the
+        # section in effect where it starts, not the one the page ends in
+        section_offsets = [0]
+        sections = [current_section]
         
         for block in blocks:
             if "lines" in block:
@@ -100,13 +179,30 @@ def parse_pdf(
                         size = span["size"]
                         
                         # Update section context
-                        current_section = _detect_section(text, size, current_section)
+                        detected = _detect_section(text, size, "")
+                        if detected:
+                            page_headers.add(detected)
+                            if detected != current_section and not _is_running_header(
+                                span["bbox"],
+                                page_height,
+                                header_pages[detected] + 1,
+                                page_index + 1,
+                            ):
+                                current_section = detected
+                                section_offsets.append(len(page_text))
+                                sections.append(detected)
                         page_text += text + " "
                         
+        header_pages.update(page_headers)
+
         # Split the text of this page
-        raw_chunks = _recursive_split(page_text, settings.chunk_size, settings.chunk_overlap)
+        raw_chunks = _recursive_split(page_text, chunk_size, chunk_overlap)
         
-        for chunk_text in raw_chunks:
+        position = 0
+        for chunk_index, chunk_text in enumerate(raw_chunks):
+            # Chunks are pieces of page_text in order
+            found = page_text.find(chunk_text, position)
+            position = found if found != -1 else position
             if len(chunk_text.strip()) < 50:  # Skip very small chunks
                 continue
                 
@@ -114,11 +210,13 @@ def parse_pdf(
                 page_number=page_index + 1,
                 source_filename=os.path.basename(file_path),
                 policy_id=policy_id,
-                section=current_section,
+                section=sections[bisect_right(section_offsets, position) - 1],
                 content_type="policy_text",
                 jurisdiction=jurisdiction,
                 claim_type=claim_type,
             )
-            yield DocumentChunk(text=chunk_text.strip(), metadata=metadata)
+            # Stable IDs: a re-ingest gives the same page/chunk position the same ID
+            chunk_id = f"{policy_id}#p{page_index + 1}#c{chunk_index}"
+            yield DocumentChunk(id=chunk_id, text=chunk_text.strip(), metadata=metadata)
             
     doc.close()
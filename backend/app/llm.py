@@ -1,9 +1,14 @@
 from __future__ import annotations
 
-from groq import Groq
+from typing import TYPE_CHECKING
 
 from app.config import settings
 
+if TYPE_CHECKING:
+    from groq import AsyncGroq, Groq
+
+_async_client: AsyncGroq | None = None
+
 
 def llm_enabled() -> bool:
     return bool(settings.groq_api_key)
@@ -12,4 +17,18 @@ def llm_enabled() -> bool:
 def get_client() -> Groq:
     if not settings.groq_api_key:
         raise ValueError("Groq API key is not configured")
+    from groq import Groq
+
     return Groq(api_key=settings.groq_api_key)
+
+
+def get_async_client() -> AsyncGroq:
+    # Shared so its connection pool is reused across requests
+    global _async_client
+    if not settings.groq_api_key:
+        raise ValueError("Groq API key is not configured")
+    if _async_client is None:
+        from groq import AsyncGroq
+
+        _async_client = AsyncGroq(api_key=settings.groq_api_key)
+    return _async_client
@@ -2,40 +2,61 @@ from __future__ import annotations
 
 import logging
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import Depends, FastAPI, File, Header, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.ingestion.parser import parse_pdf
-from app.ingestion.embeddings import embed_texts
+from app.config import settings
+from app.ingestion.embeddings import embed_texts, embedder_status, start_warmup
 from app.schemas.models import (
     AnalysisRequest,
     AnalysisResponse,
     IngestResponse,
     PolicySummary,
 )
+from app.admission import BULK, Overloaded, analyze_limiter, embedder_gate, ingest_limiter
 from app.agents.orchestrator import run_workflow
-from app.state import get_global_store, register_policy, list_policies, get_policy
+from app.metrics import metrics
+from app.profiling import sample_stacks, slow_requests
+from app.state import (
+    aget_global_store,
+    get_catalog,
+    get_policy,
+    list_policies,
+    start_store_warmup,
+    store_status,
+)
+from app.vectorstores.base import InvalidFilter
+import asyncio
+import secrets
 import shutil
 import os
-from typing import Generator
-from app.schemas.models import DocumentChunk
+from itertools import islice
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 from contextlib import asynccontextmanager
 
+_warmup_started = False
+
+
+def _begin_warmup() -> None:
+    """Start the embedder and store warm-up threads (once)."""
+    global _warmup_started
+    if not _warmup_started:
+        _warmup_started = True
+        logger.info("Warming up embedding model in the background...")
+        start_warmup()
+        start_store_warmup()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("Pre-loading embedding model to avoid cold-start latency...")
-    from app.ingestion.embeddings import get_model, embed_texts
-    try:
-        get_model()
-        logger.info("Warming up inference engine...")
-        embed_texts(["warmup"]) # This forces the ONNX graph compilation!
-        logger.info("Embedding model pre-loaded successfully.")
-    except Exception as e:
-        logger.error(f"Failed to pre-load embedding model: {e}")
+    # Warm-up runs in the background; /ready reports when it has finished
+    if settings.warmup_on_startup:
+        _begin_warmup()
     yield
 
 app = FastAPI(title="Smart Underwriter", lifespan=lifespan)
@@ -49,17 +70,93 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded) -> JSONResponse:
+    logger.warning("Rejected %s (%s queue full or wait timed out)", request.url.path, exc.name)
+    return JSONResponse(
+        {"detail": f"Server busy ({exc.name}); retry later"},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(InvalidFilter)
+async def invalid_filter(request: Request, exc: InvalidFilter) -> JSONResponse:
+    return JSONResponse({"detail": str(exc)}, status_code=400)
+
+
+async def admit_analyze():
+    async with analyze_limiter.hold():
+        yield
+
+
+async def admit_ingest():
+    async with ingest_limiter.hold():
+        yield
+
+
+# Ingests and deletes of one policy run one at a time in this process; the
+# catalog's write lock is only held for their final commit
+_policy_locks: dict[str, asyncio.Lock] = {}
+
+
+def _policy_lock(policy_id: str) -> asyncio.Lock:
+    return _policy_locks.setdefault(policy_id, asyncio.Lock())
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    if not settings.admin_token:
+        raise HTTPException(status_code=404)
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
 @app.get("/health")
 async def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    # With warmup_on_startup off, the first probe starts it; otherwise
+    # nothing would ever mark the embedder and store ready
+    _begin_warmup()
+    components = {"embedder": embedder_status(), "store": store_status()}
+    ready = all(status == "ready" for status in components.values())
+    return JSONResponse(
+        {"status": "ready" if ready else "warming", **components},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/metrics")
+async def metrics_snapshot() -> dict:
+    return metrics.snapshot()
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def admin_profile(
+    seconds: float = Query(10.0, gt=0, le=120),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+) -> str:
+    """Sample all threads for `seconds`; returns collapsed stacks for a flamegraph."""
+    try:
+        return await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/admin/slow-requests", dependencies=[Depends(require_admin)])
+async def admin_slow_requests() -> list[dict]:
+    return slow_requests()
+
+
 @app.get("/")
 async def root() -> dict:
     return {"message": "Smart Underwriter API Running"}
 
 
-@app.post("/ingest", response_model=IngestResponse)
+@app.post("/ingest", response_model=IngestResponse, dependencies=[Depends(admit_ingest)])
 async def ingest_policy(
     policy_id: str,
     file: UploadFile = File(...),
@@ -78,47 +175,64 @@ async def ingest_policy(
     temp_filename = f"temp_{policy_id}_{file.filename}"
     try:
         with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            await asyncio.to_thread(shutil.copyfileobj, file.file, buffer)
             
         logger.info(f"Saved temp file: {temp_filename}")
         
-        # Process in batches
-        BATCH_SIZE = 50
-        current_batch: list[DocumentChunk] = []
+        # Process in batches. Parsing and embedding run on worker threads;
+        # each batch's upsert stays in flight while the next one is embedded.
+        BATCH_SIZE = settings.ingest_batch_size
         total_chunks = 0
-        store = get_global_store()
-        
-        # Streaming parse
-        chunks_generator = parse_pdf(temp_filename, policy_id, jurisdiction, claim_type)
-        
-        for chunk in chunks_generator:
-            current_batch.append(chunk)
-            
-            if len(current_batch) >= BATCH_SIZE:
-                embeddings = embed_texts([c.text for c in current_batch])
-                store.add(embeddings, current_batch)
-                total_chunks += len(current_batch)
-                logger.debug(f"Processed batch of {len(current_batch)} chunks")
-                current_batch = []
-                
-        # Process remaining chunks
-        if current_batch:
-            embeddings = embed_texts([c.text for c in current_batch])
-            store.add(embeddings, current_batch)
-            total_chunks += len(current_batch)
-            logger.debug(f"Processed final batch of {len(current_batch)} chunks")
-            
-        logger.info("Stored %d chunks for policy_id=%s", total_chunks, policy_id)
-
-        register_policy(
-            PolicySummary(
-                policy_id=policy_id,
-                source_filename=file.filename,
-                jurisdiction=jurisdiction,
-                claim_type=claim_type,
-                chunks_indexed=total_chunks,
+        store = await aget_global_store()
+        pending_add: asyncio.Task | None = None
+
+        # Catalog rows for the whole ingest are buffered and committed together
+        # with the summary; the database is only locked for that final write
+        async with _policy_lock(policy_id), get_catalog().atransaction() as catalog:
+            # The previous version stays searchable until the new one is added
+            previous_ids = set(get_catalog().chunk_ids(policy_id))
+            ingested_ids: set[str] = set()
+            catalog.replace_policy(policy_id)
+
+            # Streaming parse
+            chunks_generator = parse_pdf(temp_filename, policy_id, jurisdiction, claim_type)
+            try:
+                while batch := await asyncio.to_thread(
+                    lambda: list(islice(chunks_generator, BATCH_SIZE))
+                ):
+                    async with embedder_gate.hold(priority=BULK):
+                        embeddings = await asyncio.to_thread(embed_texts, [c.text for c in batch])
+                    await asyncio.to_thread(catalog.add_chunks, embeddings, batch)
+                    if pending_add is not None:
+                        await pending_add
+                    pending_add = asyncio.create_task(store.aadd(embeddings, batch))
+                    total_chunks += len(batch)
+                    ingested_ids.update(c.id for c in batch)
+                    logger.debug(f"Processed batch of {len(batch)} chunks")
+
+                if pending_add is not None:
+                    await pending_add
+            finally:
+                if pending_add is not None and not pending_add.done():
+                    pending_add.cancel()
+
+            # Stable IDs were overwritten in place; only chunks the new version
+            # no longer has (e.g. from a longer PDF) are left to delete
+            stale_ids = sorted(previous_ids - ingested_ids)
+            if stale_ids:
+                await store.adelete(ids=stale_ids)
+
+            logger.info("Stored %d chunks for policy_id=%s", total_chunks, policy_id)
+
+            catalog.upsert_policy(
+                PolicySummary(
+                    policy_id=policy_id,
+                    source_filename=file.filename,
+                    jurisdiction=jurisdiction,
+                    claim_type=claim_type,
+                    chunks_indexed=total_chunks,
+                )
             )
-        )
 
         return IngestResponse(policy_id=policy_id, chunks_indexed=total_chunks)
         
@@ -129,7 +243,7 @@ async def ingest_policy(
             logger.info(f"Cleaned up temp file: {temp_filename}")
 
 
-@app.post("/analyze", response_model=AnalysisResponse)
+@app.post("/analyze", response_model=AnalysisResponse, dependencies=[Depends(admit_analyze)])
 async def analyze_claim(request: AnalysisRequest) -> AnalysisResponse:
     logger.info(
         "Analyze request policy_id=%s jurisdiction=%s claim_type=%s",
@@ -137,8 +251,8 @@ async def analyze_claim(request: AnalysisRequest) -> AnalysisResponse:
         request.jurisdiction,
         request.claim_type,
     )
-    store = get_global_store()
-    response = run_workflow(store, request)
+    store = await aget_global_store()
+    response = await run_workflow(store, request)
     logger.info(
         "Analyze response decision=%s citations=%d",
         response.decision,
@@ -158,3 +272,18 @@ async def policy_detail(policy_id: str) -> PolicySummary:
     if not summary:
         return PolicySummary(policy_id=policy_id, chunks_indexed=0)
     return summary
+
+
+@app.delete("/policies/{policy_id}", response_model=PolicySummary, dependencies=[Depends(admit_ingest)])
+async def delete_policy(policy_id: str) -> PolicySummary:
+    summary = get_policy(policy_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail=f"Unknown policy_id: {policy_id}")
+    logger.info("Delete request policy_id=%s", policy_id)
+
+    store = await aget_global_store()
+    async with _policy_lock(policy_id), get_catalog().atransaction() as catalog:
+        # Vectors first: Pinecone looks up the policy's chunk IDs in the catalog
+        await store.adelete(policy_id=policy_id)
+        catalog.delete_policy(policy_id)
+    return summary
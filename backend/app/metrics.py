@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Dict
+import threading
+
+
+class Metrics:
+    """
+    Process-local counters, gauges and timing summaries, served as JSON by
+    /metrics. Each uvicorn worker reports its own values.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def add(self, name: str, delta: float) -> None:
+        """Move a gauge up or down (e.g. in-flight or queued work)."""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one sample (count, sum, max) of a duration or size."""
+        with self._lock:
+            summary = self._timings.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {name: dict(summary) for name, summary in self._timings.items()},
+            }
+
+
+metrics = Metrics()
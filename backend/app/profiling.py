@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+import functools
+import logging
+import sys
+import threading
+import time
+
+from app.config import settings
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# -- slow-request recorder -----------------------------------------------------
+
+
+@dataclass
+class RequestTrace:
+    """Per-stage timings and LLM token counts of one analysis."""
+
+    label: str
+    started: float = field(default_factory=time.perf_counter)
+    stages: Dict[str, float] = field(default_factory=dict)
+    tokens: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def to_dict(self, total: float) -> dict:
+        return {
+            "request": self.label,
+            "recorded_at": time.time(),
+            "total_seconds": round(total, 4),
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "tokens": self.tokens,
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+_slow_requests: Deque[dict] = deque(maxlen=settings.slow_request_log_size)
+
+
+@contextmanager
+def trace_request(label: str) -> Iterator[RequestTrace]:
+    """Trace the enclosed work; keep it if it ran longer than the threshold."""
+    trace = RequestTrace(label=label)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        total = time.perf_counter() - trace.started
+        if total >= settings.slow_request_threshold_seconds:
+            record = trace.to_dict(total)
+            _slow_requests.append(record)
+            metrics.incr("slow_requests_total")
+            logger.warning("Slow request %.2fs: %s", total, record["stages"])
+
+
+def untraced() -> None:
+    """Detach the current context (e.g. a background task) from any trace."""
+    _current_trace.set(None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    trace = _current_trace.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.stages[name] = trace.stages.get(name, 0.0) + time.perf_counter() - started
+
+
+def traced(name: str) -> Callable:
+    """Time every call of a coroutine function as a stage of the current trace."""
+
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def record_tokens(name: str, usage: Any, prompt_chars: int) -> None:
+    """Prompt/completion tokens of an LLM call (estimated if not reported)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    trace.tokens[name] = {
+        # ~4 characters per token for English text
+        "prompt_tokens": prompt_tokens if prompt_tokens is not None else prompt_chars // 4,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+    }
+
+
+def slow_requests() -> List[dict]:
+    return list(_slow_requests)
+
+
+# -- sampling profiler ---------------------------------------------------------
+
+_profile_lock = threading.Lock()
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_stacks(seconds: float, interval: float) -> str:
+    """
+    Sample every thread's Python stack for `seconds` and return the counts in
+    collapsed-stack format ("thread;outer;...;inner count" per line), ready
+    for flamegraph.pl or speedscope. Raises RuntimeError if a profile is
+    already running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        me = threading.get_ident()
+        counts: Counter[str] = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                counts[f"{names.get(ident, ident)};{_collapse(frame)}"] += 1
+            time.sleep(interval)
+        return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+    finally:
+        _profile_lock.release()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 from typing import List, Optional, Literal
+import uuid
+
 from pydantic import BaseModel, Field
 
 
@@ -16,6 +18,7 @@ class ChunkMetadata(BaseModel):
 
 
 class DocumentChunk(BaseModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     text: str
     metadata: ChunkMetadata
 
@@ -30,6 +33,9 @@ class Citation(BaseModel):
 
 class AnalysisRequest(BaseModel):
     policy_id: str = Field(..., description="Policy identifier used during ingestion")
+    policy_ids: Optional[List[str]] = Field(
+        None, description="Search these policies instead of policy_id"
+    )
     claim_text: str
     jurisdiction: Optional[str] = None
     claim_type: Optional[str] = None
@@ -40,6 +46,8 @@ class AnalysisResponse(BaseModel):
     rationale: str
     citations: List[Citation]
     risk_level: str = "medium"  # low | medium | high
+    # How the answer was produced: fast-path | llm | llm-no-critic | retrieval-only | timeout
+    path: str = "llm"
 
 
 class LLMAnalysisOutput(BaseModel):
@@ -1,42 +1,129 @@
 from __future__ import annotations
 
-from typing import Dict
+import asyncio
+import logging
+import threading
 
 from app.schemas.models import PolicySummary
 
+from app.catalog import Catalog
+from app.clauses import ClauseIndex
 from app.config import settings
-from app.vectorstores.in_memory import InMemoryVectorStore
-from app.vectorstores.pinecone import PineconeVectorStore
 from app.vectorstores.base import VectorStore
 
+logger = logging.getLogger(__name__)
 
 # Single global vector store for all policies
 _GLOBAL_STORE: VectorStore | None = None
-POLICY_REGISTRY: Dict[str, PolicySummary] = {}
+_CATALOG: Catalog | None = None
+_CLAUSE_INDEX: ClauseIndex | None = None
+_store_lock = threading.Lock()
+# Separate from _store_lock: _build_store() opens the catalog while holding it
+_catalog_lock = threading.Lock()
+_clause_index_lock = threading.Lock()
+_store_ready = threading.Event()
 
 
 def _build_store() -> VectorStore:
+    # Backends are imported on demand so only the configured SDK is loaded
     match settings.vector_store:
         case "pinecone":
-            return PineconeVectorStore(namespace=None)
+            from app.vectorstores.pinecone import PineconeVectorStore
+
+            return PineconeVectorStore(get_catalog(), namespace=settings.pinecone_namespace)
+        case "sharded":
+            from app.vectorstores.sharded import ShardedVectorStore
+
+            catalog = get_catalog()
+            return ShardedVectorStore(
+                reload=lambda policy_id: catalog.iter_chunks(policy_id=policy_id)
+            )
+        case "shared":
+            from app.vectorstores.shared import SharedVectorStore
+
+            return SharedVectorStore()
+        case "chroma":
+            from app.vectorstores.chroma import ChromaVectorStore
+
+            return ChromaVectorStore()
         case _:
+            from app.vectorstores.in_memory import InMemoryVectorStore
+
             return InMemoryVectorStore()
 
 
+def _rebuild_from_catalog(store: VectorStore) -> None:
+    """Reload a non-persistent store from the catalog (no PDFs, no embedder)."""
+    total = 0
+    for embeddings, chunks in get_catalog().iter_chunks():
+        store.add(embeddings, chunks)
+        total += len(chunks)
+    logger.info("Rebuilt local vector store from catalog: %d chunks", total)
+
+
+def get_catalog() -> Catalog:
+    global _CATALOG
+    if _CATALOG is not None:
+        return _CATALOG
+    with _catalog_lock:
+        if _CATALOG is None:
+            _CATALOG = Catalog(settings.catalog_path)
+    return _CATALOG
+
+
+def get_clause_index() -> ClauseIndex:
+    global _CLAUSE_INDEX
+    if _CLAUSE_INDEX is not None:
+        return _CLAUSE_INDEX
+    catalog = get_catalog()
+    with _clause_index_lock:
+        if _CLAUSE_INDEX is None:
+            _CLAUSE_INDEX = ClauseIndex(catalog)
+    return _CLAUSE_INDEX
+
+
 def get_global_store() -> VectorStore:
     global _GLOBAL_STORE
-    if _GLOBAL_STORE is None:
-        _GLOBAL_STORE = _build_store()
+    if _GLOBAL_STORE is not None:
+        return _GLOBAL_STORE
+    with _store_lock:
+        if _GLOBAL_STORE is None:
+            store = _build_store()
+            if not store.persistent:
+                _rebuild_from_catalog(store)
+            _GLOBAL_STORE = store
+            _store_ready.set()
     return _GLOBAL_STORE
 
 
-def register_policy(summary: PolicySummary) -> None:
-    POLICY_REGISTRY[summary.policy_id] = summary
+async def aget_global_store() -> VectorStore:
+    """get_global_store() without blocking the event loop on a cold start."""
+    if _GLOBAL_STORE is not None:
+        return _GLOBAL_STORE
+    return await asyncio.to_thread(get_global_store)
+
+
+def start_store_warmup() -> threading.Thread:
+    """Build (and, for local stores, rebuild) the global store off the request path."""
+
+    def warm() -> None:
+        try:
+            get_global_store()
+        except Exception as e:
+            logger.error(f"Failed to initialize vector store: {e}")
+
+    thread = threading.Thread(target=warm, name="store-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def store_status() -> str:
+    return "ready" if _store_ready.is_set() else "warming"
 
 
 def list_policies() -> list[PolicySummary]:
-    return list(POLICY_REGISTRY.values())
+    return get_catalog().list_policies()
 
 
 def get_policy(policy_id: str) -> PolicySummary | None:
-    return POLICY_REGISTRY.get(policy_id)
+    return get_catalog().get_policy(policy_id)
@@ -1,11 +1,28 @@
 from __future__ import annotations
 
 from typing import Dict, List, Optional, Tuple
+import asyncio
 
 from app.schemas.models import DocumentChunk
 
 
+class InvalidFilter(ValueError):
+    """A metadata filter or search scope a store cannot apply; mapped to 400 by the API."""
+
+
+def page_number_filter(value: str) -> int:
+    """Filter values arrive as strings; page_number is stored as an int."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidFilter(f"page_number filter must be an integer, got {value!r}") from None
+
+
 class VectorStore:
+    # Persistent backends keep their data across restarts; the others are
+    # rebuilt from the catalog on startup.
+    persistent: bool = False
+
     def add(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
         raise NotImplementedError
 
@@ -14,5 +31,54 @@ class VectorStore:
         query_embedding: List[float],
         top_k: int = 5,
         metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
     ) -> List[Tuple[float, DocumentChunk]]:
+        """
+        Return the top_k chunks most similar to query_embedding.
+        When policy_ids is given, only those policies' partitions are searched.
+        """
         raise NotImplementedError
+
+    def delete(self, policy_id: Optional[str] = None, ids: Optional[List[str]] = None) -> None:
+        """Remove every chunk of policy_id, and/or the chunks with the given IDs."""
+        raise NotImplementedError
+
+    # -- asyncio ----------------------------------------------------------------
+    # Defaults run the blocking methods on a worker thread so the event loop
+    # never stalls; backends with a native async client override these.
+
+    async def aadd(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
+        await asyncio.to_thread(self.add, embeddings, chunks)
+
+    async def adelete(
+        self, policy_id: Optional[str] = None, ids: Optional[List[str]] = None
+    ) -> None:
+        await asyncio.to_thread(self.delete, policy_id, ids)
+
+    async def aquery(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[float, DocumentChunk]]:
+        return await asyncio.to_thread(
+            self.query, query_embedding, top_k, metadata_filter, policy_ids
+        )
+
+    async def aquery_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
+    ) -> List[List[Tuple[float, DocumentChunk]]]:
+        """Run several queries concurrently; results are in input order."""
+        return list(
+            await asyncio.gather(
+                *(
+                    self.aquery(embedding, top_k, metadata_filter, policy_ids)
+                    for embedding in query_embeddings
+                )
+            )
+        )
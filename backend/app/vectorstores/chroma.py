@@ -1,55 +1,145 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
-import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
 
 import chromadb
 
 from app.config import settings
 from app.schemas.models import ChunkMetadata, DocumentChunk
-from app.vectorstores.base import VectorStore
+from app.vectorstores.base import VectorStore, page_number_filter
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _client(path: str):
+    """One PersistentClient per directory, shared by every store opened on it."""
+    with _clients_lock:
+        client = _clients.get(path)
+        if client is None:
+            client = chromadb.PersistentClient(path=path)
+            _clients[path] = client
+        return client
+
+
+def _metadata(chunk: DocumentChunk) -> Dict[str, Any]:
+    # Chroma rejects None values and empty lists; absent keys read back as None
+    return {k: v for k, v in chunk.metadata.model_dump().items() if v is not None and v != []}
 
 
 class ChromaVectorStore(VectorStore):
+    """
+    Embedded Chroma collection persisted under chroma_persist_dir: a local
+    store that survives restarts without a separate service or a catalog
+    rebuild.
+    """
+
+    persistent = True
+
     def __init__(self) -> None:
-        client = chromadb.PersistentClient(path=settings.chroma_persist_dir)
-        self._collection = client.get_or_create_collection(settings.chroma_collection)
+        self._client = _client(settings.chroma_persist_dir)
+        # Scores are 1 - distance, which needs cosine distance (Chroma defaults to L2)
+        self._collection = self._client.get_or_create_collection(
+            settings.chroma_collection, configuration={"hnsw": {"space": "cosine"}}
+        )
+        space = ((self._collection.configuration or {}).get("hnsw") or {}).get("space")
+        if space not in (None, "cosine"):
+            logger.warning(
+                "Chroma collection %s uses %s distance; scores assume cosine. "
+                "Re-ingest into a new CHROMA_COLLECTION.",
+                settings.chroma_collection,
+                space,
+            )
+        self._max_batch = self._client.get_max_batch_size()
 
     def add(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
-        ids = [str(uuid.uuid4()) for _ in chunks]
-        metadatas = [chunk.metadata.model_dump() for chunk in chunks]
-        documents = [chunk.text for chunk in chunks]
-        self._collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas,
-        )
+        # One call per max-size batch; larger calls are rejected by Chroma.
+        # Upsert: a re-ingest overwrites chunks under their stable IDs.
+        for start in range(0, len(chunks), self._max_batch):
+            batch = chunks[start : start + self._max_batch]
+            self._collection.upsert(
+                ids=[chunk.id for chunk in batch],
+                embeddings=embeddings[start : start + len(batch)],
+                documents=[chunk.text for chunk in batch],
+                metadatas=[_metadata(chunk) for chunk in batch],
+            )
 
-    def query(
+    def delete(self, policy_id: Optional[str] = None, ids: Optional[List[str]] = None) -> None:
+        if policy_id is not None:
+            self._collection.delete(where={"policy_id": policy_id})
+        for start in range(0, len(ids or []), self._max_batch):
+            self._collection.delete(ids=ids[start : start + self._max_batch])
+
+    @staticmethod
+    def _where(
+        metadata_filter: Optional[Dict[str, str]], policy_ids: Optional[List[str]]
+    ) -> Optional[Dict[str, Any]]:
+        clauses: List[Dict[str, Any]] = [
+            {key: page_number_filter(value) if key == "page_number" else value}
+            for key, value in (metadata_filter or {}).items()
+        ]
+        if policy_ids is not None:
+            clauses.append({"policy_id": {"$in": policy_ids}})
+        # Chroma requires an explicit $and once there is more than one condition
+        return clauses[0] if len(clauses) == 1 else ({"$and": clauses} if clauses else None)
+
+    def _query_batch(
         self,
-        query_embedding: List[float],
-        top_k: int = 5,
-        metadata_filter: Optional[Dict[str, str]] = None,
-    ) -> List[Tuple[float, DocumentChunk]]:
+        query_embeddings: List[List[float]],
+        top_k: int,
+        metadata_filter: Optional[Dict[str, str]],
+        policy_ids: Optional[List[str]],
+    ) -> List[List[Tuple[float, DocumentChunk]]]:
+        if policy_ids is not None and not policy_ids:
+            return [[] for _ in query_embeddings]  # Chroma rejects an empty $in
         results = self._collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=top_k,
-            where=metadata_filter or {},
+            where=self._where(metadata_filter, policy_ids),
             include=["documents", "metadatas", "distances"],
         )
 
-        documents = results.get("documents", [[]])[0]
-        metadatas = results.get("metadatas", [[]])[0]
-        distances = results.get("distances", [[]])[0]
+        batch: List[List[Tuple[float, DocumentChunk]]] = []
+        for ids, documents, metadatas, distances in zip(
+            results["ids"], results["documents"], results["metadatas"], results["distances"]
+        ):
+            scored: List[Tuple[float, DocumentChunk]] = []
+            for chunk_id, text, metadata, distance in zip(ids, documents, metadatas, distances):
+                chunk = DocumentChunk(
+                    id=chunk_id,
+                    text=text,
+                    metadata=ChunkMetadata(**metadata),
+                )
+                score = 1.0 - float(distance)
+                scored.append((score, chunk))
+            batch.append(scored)
+        return batch
 
-        scored: List[Tuple[float, DocumentChunk]] = []
-        for text, metadata, distance in zip(documents, metadatas, distances):
-            chunk = DocumentChunk(
-                text=text,
-                metadata=ChunkMetadata(**metadata),
-            )
-            score = 1.0 - float(distance)
-            scored.append((score, chunk))
+    def query(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[float, DocumentChunk]]:
+        return self._query_batch([query_embedding], top_k, metadata_filter, policy_ids)[0]
 
-        return scored
+    async def aquery_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
+    ) -> List[List[Tuple[float, DocumentChunk]]]:
+        # The embedded client has no async API; one batched call on a worker
+        # thread beats one thread hop per query.
+        if not query_embeddings:
+            return []
+        return await asyncio.to_thread(
+            self._query_batch, query_embeddings, top_k, metadata_filter, policy_ids
+        )
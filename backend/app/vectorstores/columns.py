@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.schemas.models import ChunkMetadata, DocumentChunk
+from app.vectorstores.base import page_number_filter
+from app.vectorstores.matrix import GrowableArray
+
+# Low-cardinality metadata fields stored as interned integer codes
+CATEGORICAL_FIELDS = (
+    "source_filename",
+    "policy_id",
+    "section",
+    "content_type",
+    "jurisdiction",
+    "claim_type",
+    "keywords",
+)
+
+_MISSING = -1
+_KEYWORD_SEP = "\x1f"
+
+
+class Interner:
+    """Maps repeated strings to small integer codes (shared across partitions)."""
+
+    def __init__(self) -> None:
+        self._codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return _MISSING
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def value(self, code: int) -> Optional[str]:
+        return None if code == _MISSING else self.values[code]
+
+
+class _StringArena:
+    """UTF-8 strings packed into one growing buffer, addressed by offset."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        # N + 1 entries: string i is buffer[offsets[i]:offsets[i + 1]]. The end
+        # offsets are published after the bytes, so a lock-free reader never
+        # sees past the last committed string.
+        self._offsets = GrowableArray(np.int64)
+        self._offsets.append(np.zeros(1, dtype=np.int64))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buffer) + self._offsets.nbytes
+
+    def extend(self, values: List[str]) -> None:
+        ends = []
+        for value in values:
+            self._buffer += value.encode("utf-8")
+            ends.append(len(self._buffer))
+        self._offsets.append(np.asarray(ends, dtype=np.int64))
+
+    def get(self, index: int) -> str:
+        offsets = self._offsets.data
+        return self._buffer[int(offsets[index]) : int(offsets[index + 1])].decode("utf-8")
+
+
+class ChunkColumns:
+    """
+    Chunk text and metadata held column-wise: text and IDs in string arenas,
+    page numbers in an int32 column, categorical fields as int32 codes into a
+    shared Interner. DocumentChunk objects are only built for results.
+    """
+
+    def __init__(self, interner: Interner) -> None:
+        self._interner = interner
+        self._text = _StringArena()
+        self._ids = _StringArena()
+        self._pages = GrowableArray(np.int32)
+        self._codes = {name: GrowableArray(np.int32) for name in CATEGORICAL_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self._text.nbytes
+            + self._ids.nbytes
+            + self._pages.nbytes
+            + sum(column.nbytes for column in self._codes.values())
+        )
+
+    def extend(self, chunks: List[DocumentChunk]) -> None:
+        self._text.extend([chunk.text for chunk in chunks])
+        self._ids.extend([chunk.id for chunk in chunks])
+        self._pages.append(np.array([c.metadata.page_number for c in chunks], dtype=np.int32))
+        for name, column in self._codes.items():
+            values = [getattr(chunk.metadata, name) for chunk in chunks]
+            if name == "keywords":
+                values = [None if v is None else _KEYWORD_SEP.join(v) for v in values]
+            column.append(np.array([self._interner.intern(v) for v in values], dtype=np.int32))
+
+    def mask(self, metadata_filter: Dict[str, str], size: Optional[int] = None) -> np.ndarray:
+        """Vectorized equality filter over the metadata columns (first `size` rows)."""
+        size = len(self) if size is None else size
+        mask = np.ones(size, dtype=bool)
+        for key, value in metadata_filter.items():
+            if key == "page_number":
+                mask &= self._pages.data[:size] == page_number_filter(value)
+            elif key in self._codes and isinstance(value, str):
+                code = self._interner.lookup(value)
+                if code is None:
+                    return np.zeros(size, dtype=bool)
+                mask &= self._codes[key].data[:size] == code
+            else:
+                return np.zeros(size, dtype=bool)
+        return mask
+
+    def codes(self, name: str) -> np.ndarray:
+        """Interned codes of a categorical field, one per row."""
+        return self._codes[name].data
+
+    def chunk_id(self, index: int) -> str:
+        return self._ids.get(index)
+
+    def materialize(self, index: int) -> DocumentChunk:
+        fields = {
+            name: self._interner.value(int(column.data[index]))
+            for name, column in self._codes.items()
+        }
+        if fields["keywords"] is not None:
+            keywords = fields["keywords"]
+            fields["keywords"] = keywords.split(_KEYWORD_SEP) if keywords else []
+        return DocumentChunk(
+            id=self._ids.get(index),
+            text=self._text.get(index),
+            metadata=ChunkMetadata(page_number=int(self._pages.data[index]), **fields),
+        )
@@ -1,51 +1,387 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
-import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
 
+import heapq
+import logging
+import shutil
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+from app.config import settings
 from app.schemas.models import DocumentChunk
 from app.vectorstores.base import VectorStore
+from app.vectorstores.columns import ChunkColumns, Interner
+from app.vectorstores.matrix import GrowableArray, make_matrix, normalize
+
+logger = logging.getLogger(__name__)
 
 
-def _cosine_similarity(a: List[float], b: List[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    norm_a = math.sqrt(sum(x * x for x in a))
-    norm_b = math.sqrt(sum(x * x for x in b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot / (norm_a * norm_b)
+@dataclass(frozen=True)
+class _Centroids:
+    """Unit mean vectors of a partition's live rows, overall and per section."""
 
+    policy: np.ndarray
+    sections: np.ndarray  # section codes
+    matrix: np.ndarray  # one centroid row per section
+    live: np.ndarray  # live rows per section
 
-def _match_metadata(
-    chunk: DocumentChunk, metadata_filter: Optional[Dict[str, str]]
-) -> bool:
-    if not metadata_filter:
+
+def _is_flat(scores: np.ndarray, keep: int) -> bool:
+    """
+    True when keeping only the `keep` best centroids would be a guess: the
+    best one barely beats the first one that would be skipped (or there is
+    nothing to skip).
+    """
+    if len(scores) <= keep:
         return True
-    for key, value in metadata_filter.items():
-        if getattr(chunk.metadata, key, None) != value:
-            return False
-    return True
+    skipped = np.partition(scores, len(scores) - keep - 1)[len(scores) - keep - 1]
+    return float(scores.max() - skipped) < settings.vector_store_centroid_min_gap
+
+
+class _Partition:
+    """
+    Chunks of a single policy with their own L2-normalized matrix.
+
+    Deleted rows are tombstoned: they stay in place, masked out of searches,
+    until the store compacts the partition. Adding a chunk ID that is
+    already present replaces (tombstones) its previous row.
+    """
+
+    def __init__(self, dim: int, directory: Optional[str], interner: Interner) -> None:
+        self.dim = dim
+        self._matrix = make_matrix(dim, settings.vector_store_quantization, directory)
+        self._columns = ChunkColumns(interner)
+        # Deleted flags, set in place (a row is never undeleted)
+        self._deleted = GrowableArray(np.bool_)
+        self.dead = 0
+        # Rows visible to searches: published by add() once every array holds them
+        self._size = 0
+        # chunk id -> live row, for deletes and replacements by ID
+        self._rows_by_id: Dict[str, int] = {}
+        # Per section code: rows, and the sum and count of live normalized rows
+        self._section_rows: Dict[int, GrowableArray] = {}
+        self._section_sums: Dict[int, np.ndarray] = {}
+        self._section_live: Dict[int, int] = {}
+        self.centroids = self._build_centroids()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes + self._columns.nbytes + self._deleted.nbytes
+
+    def add(self, embeddings: np.ndarray, chunks: List[DocumentChunk]) -> None:
+        start = self._size
+        rows = normalize(embeddings)
+        self._matrix.append(rows)
+        self._columns.extend(chunks)
+        self._deleted.append(np.zeros(len(chunks), dtype=bool))
+        replaced = []
+        for i, chunk in enumerate(chunks):
+            previous = self._rows_by_id.get(chunk.id)
+            if previous is not None:
+                replaced.append(previous)
+            self._rows_by_id[chunk.id] = start + i
+
+        codes = self._columns.codes("section")[start:]
+        for code in np.unique(codes):
+            members = np.flatnonzero(codes == code)
+            code = int(code)
+            self._section_rows.setdefault(code, GrowableArray(np.int64)).append(members + start)
+            self._update_section(code, rows[members], len(members))
+        self.centroids = self._build_centroids()
+        self._size = start + len(chunks)
+        if replaced:
+            # Once the new rows are visible, so a replaced chunk is never missing
+            self.tombstone(np.asarray(replaced, dtype=np.int64))
+
+    def _update_section(self, code: int, rows: np.ndarray, count: int) -> None:
+        total = rows.sum(axis=0, dtype=np.float64)
+        self._section_sums[code] = self._section_sums.get(code, 0.0) + total
+        self._section_live[code] = self._section_live.get(code, 0) + count
+
+    def _build_centroids(self) -> _Centroids:
+        sections = np.array([c for c, n in self._section_live.items() if n > 0], dtype=np.int64)
+        sums = np.array([self._section_sums[c] for c in sections]).reshape(len(sections), self.dim)
+        return _Centroids(
+            policy=normalize(sums.sum(axis=0, keepdims=True))[0],
+            sections=sections,
+            matrix=normalize(sums),
+            live=np.array([self._section_live[c] for c in sections], dtype=np.int64),
+        )
+
+    def section_rows(self, sections: np.ndarray) -> np.ndarray:
+        rows = np.concatenate([self._section_rows[int(code)].data for code in sections])
+        return rows[rows < self._size]
+
+    def tombstones(self, size: int) -> np.ndarray:
+        """A copy of the deleted flags of the first `size` rows."""
+        return self._deleted.data[:size].copy()
+
+    def tombstone(self, rows: np.ndarray) -> None:
+        """Flag rows deleted in place; the cost depends on len(rows) only."""
+        deleted = self._deleted.data
+        rows = np.unique(rows[~deleted[rows]])
+        if not len(rows):
+            return
+        deleted[rows] = True
+        self.dead += len(rows)
+        for row in rows.tolist():
+            chunk_id = self._columns.chunk_id(row)
+            if self._rows_by_id.get(chunk_id) == row:
+                del self._rows_by_id[chunk_id]
+
+        # Deleted rows no longer pull their section's centroid (rebuilt from
+        # per-section sums: sections x dim, independent of the row count)
+        codes = self._columns.codes("section")[rows]
+        vectors = self._matrix.rows(rows)
+        for code in np.unique(codes):
+            members = codes == code
+            self._update_section(int(code), -vectors[members], -int(members.sum()))
+        self.centroids = self._build_centroids()
+
+    def delete_ids(self, ids: Set[str]) -> Set[str]:
+        """Tombstone the rows of the given chunk IDs; returns the IDs found here."""
+        found = {chunk_id for chunk_id in ids if chunk_id in self._rows_by_id}
+        if found:
+            self.tombstone(np.array([self._rows_by_id[i] for i in found], dtype=np.int64))
+        return found
+
+    def export(self, indices: Optional[np.ndarray] = None) -> Tuple[np.ndarray, List[DocumentChunk]]:
+        """Rows (full precision, normalized) and chunks; all live rows by default."""
+        if indices is None:
+            indices = np.flatnonzero(~self.tombstones(self._size))
+        return self._matrix.rows(indices), [self._columns.materialize(int(i)) for i in indices]
+
+    def materialize(self, index: int) -> DocumentChunk:
+        return self._columns.materialize(index)
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        metadata_filter: Optional[Dict[str, str]],
+        rows: Optional[np.ndarray] = None,
+    ) -> List[Tuple[float, int]]:
+        """
+        Best (score, row) pairs among all rows, or among `rows` only; chunks
+        are materialized by the caller.
+        """
+        # Read once: a concurrent add() may be appending past it; arrays are clipped to it
+        size = self._size
+        if size == 0 or top_k <= 0 or (rows is not None and len(rows) == 0):
+            return []
+        scores = self._matrix.scores(query, rows, size)
+        if metadata_filter:
+            mask = self._columns.mask(metadata_filter, size)
+            scores = np.where(mask if rows is None else mask[rows], scores, -np.inf)
+        if self.dead:
+            deleted = self._deleted.data[:size]
+            scores[deleted if rows is None else deleted[rows]] = -np.inf
+
+        # Quantized scores only pick a shortlist; exact scores decide the order
+        shortlist = top_k if self._matrix.exact else top_k * settings.vector_store_rescore_factor
+        k = min(shortlist, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.isfinite(scores[top])]
+        found = top if rows is None else rows[top]
+        if not self._matrix.exact:
+            exact = self._matrix.rows(found) @ query
+            order = np.argsort(-exact)[:top_k]
+            return [(float(exact[i]), int(found[i])) for i in order]
+        return [(float(scores[i]), int(row)) for i, row in zip(top, found)]
 
 
 class InMemoryVectorStore(VectorStore):
     def __init__(self) -> None:
-        self._rows: List[Tuple[List[float], DocumentChunk]] = []
+        self._partitions: Dict[str, _Partition] = {}
+        self._interner = Interner()
+        self._directory: Optional[str] = None
+        if settings.vector_store_quantization != "none":
+            # Full-precision rows for rescoring live on disk for this store's lifetime
+            self._directory = tempfile.mkdtemp(
+                prefix="vectors-", dir=settings.vector_store_rescore_dir
+            )
+            weakref.finalize(self, shutil.rmtree, self._directory, True)
+        # Serializes writers (add/delete/compaction swaps); queries take no lock
+        self._write_lock = threading.Lock()
+        self._compacting: Set[str] = set()
+
+    @property
+    def nbytes(self) -> int:
+        """Resident bytes held by the vector matrices and chunk columns."""
+        return sum(partition.nbytes for partition in list(self._partitions.values()))
 
     def add(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
-        for embedding, chunk in zip(embeddings, chunks):
-            self._rows.append((embedding, chunk))
+        by_policy: Dict[str, List[int]] = {}
+        for index, chunk in enumerate(chunks):
+            by_policy.setdefault(chunk.metadata.policy_id, []).append(index)
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        with self._write_lock:
+            for policy_id, indices in by_policy.items():
+                partition = self._partitions.get(policy_id)
+                if partition is None:
+                    partition = _Partition(matrix.shape[1], self._directory, self._interner)
+                    self._partitions[policy_id] = partition
+                partition.add(matrix[indices], [chunks[i] for i in indices])
+                if partition.dead:
+                    self._maybe_compact(policy_id, partition)  # rows replaced by ID
+
+    def delete(self, policy_id: Optional[str] = None, ids: Optional[List[str]] = None) -> None:
+        with self._write_lock:
+            if policy_id is not None:
+                self._partitions.pop(policy_id, None)
+            if not ids:
+                return
+            remaining = set(ids)
+            # Parsed chunk IDs start with "<policy_id>#": look there first
+            owners = {chunk_id.split("#", 1)[0] for chunk_id in remaining}
+            ordered = sorted(self._partitions.items(), key=lambda item: item[0] not in owners)
+            for owner, partition in ordered:
+                if not remaining:
+                    break
+                found = partition.delete_ids(remaining)
+                if found:
+                    remaining -= found
+                    self._maybe_compact(owner, partition)
+
+    def _maybe_compact(self, policy_id: str, partition: _Partition) -> None:
+        if partition.dead <= settings.vector_store_compact_ratio * len(partition):
+            return
+        if policy_id in self._compacting:
+            return
+        self._compacting.add(policy_id)
+        threading.Thread(
+            target=self._compact,
+            args=(policy_id, partition),
+            name=f"compact-{policy_id}",
+            daemon=True,
+        ).start()
+
+    def _compact(self, policy_id: str, old: _Partition) -> None:
+        """
+        Rebuild a partition without its tombstoned rows, off the query path:
+        queries keep using the old partition until the new one is swapped in.
+        """
+        try:
+            with self._write_lock:
+                size = len(old)
+                live = np.flatnonzero(~old.tombstones(size))
+            # Rows are append-only, so the snapshot can be read without the lock
+            fresh = _Partition(old.dim, self._directory, self._interner)
+            if len(live):
+                fresh.add(*old.export(live))
+
+            with self._write_lock:
+                if self._partitions.get(policy_id) is not old:
+                    return  # dropped or replaced meanwhile
+                # Catch up with rows added and deleted while rebuilding
+                if len(old) > size:
+                    fresh.add(*old.export(np.arange(size, len(old))))
+                deleted = old.tombstones(len(old))
+                fresh.tombstone(
+                    np.flatnonzero(np.concatenate([deleted[live], deleted[size:]]))
+                )
+                self._partitions[policy_id] = fresh
+            logger.info(
+                "Compacted policy_id=%s: %d -> %d rows", policy_id, size, len(fresh)
+            )
+        except Exception as e:
+            logger.error(f"Compaction of policy_id={policy_id} failed: {e}")
+        finally:
+            with self._write_lock:
+                self._compacting.discard(policy_id)
+
+    def policy_ids(self) -> List[str]:
+        return list(self._partitions)
+
+    def pop_policy(self, policy_id: str) -> Tuple[np.ndarray, List[DocumentChunk]]:
+        """Remove a policy and return its embeddings and chunks (for moving it)."""
+        with self._write_lock:
+            partition = self._partitions.pop(policy_id, None)
+        if partition is None:
+            return np.empty((0, 0), dtype=np.float32), []
+        return partition.export()
 
     def query(
         self,
         query_embedding: List[float],
         top_k: int = 5,
         metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
     ) -> List[Tuple[float, DocumentChunk]]:
-        scored: List[Tuple[float, DocumentChunk]] = []
-        for embedding, chunk in self._rows:
-            if not _match_metadata(chunk, metadata_filter):
-                continue
-            score = _cosine_similarity(query_embedding, embedding)
-            scored.append((score, chunk))
-        scored.sort(key=lambda item: item[0], reverse=True)
-        return scored[:top_k]
+        if policy_ids is None:
+            partitions = list(self._partitions.values())
+        else:
+            # get(): a concurrent delete may drop a partition mid-query
+            scoped = (self._partitions.get(policy_id) for policy_id in policy_ids)
+            partitions = [partition for partition in scoped if partition is not None]
+
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        hits: List[Tuple[float, int, _Partition]] = []
+        plan = self._probe(query, partitions, top_k)
+        if plan is not None:
+            for partition, rows in plan:
+                hits.extend(
+                    (score, row, partition)
+                    for score, row in partition.search(query, top_k, metadata_filter, rows)
+                )
+            if len(hits) < top_k:
+                hits = []  # e.g. a metadata filter matched little of the probed sections
+        if not hits:
+            for partition in partitions:
+                hits.extend((score, row, partition) for score, row in partition.search(query, top_k, metadata_filter))
+        # Only the overall top_k are turned into DocumentChunk objects
+        best = heapq.nlargest(top_k, hits, key=lambda hit: hit[0])
+        return [(score, partition.materialize(row)) for score, row, partition in best]
+
+    def _probe(
+        self, query: np.ndarray, partitions: List[_Partition], top_k: int
+    ) -> Optional[List[Tuple[_Partition, np.ndarray]]]:
+        """
+        Two-stage search plan: score policy centroids, then the section
+        centroids of the best policies, and return the rows of the best
+        sections per partition. None means scan everything: the corpus is
+        small, or section scores are too flat to prune safely.
+        """
+        min_rows = settings.vector_store_centroid_min_rows
+        if min_rows is None or sum(len(p) for p in partitions) < min_rows:
+            return None
+        centroids = [partition.centroids for partition in partitions]
+
+        probe_policies = settings.vector_store_probe_policies
+        if len(partitions) > probe_policies:
+            policy_scores = np.stack([c.policy for c in centroids]) @ query
+            # Flat policy scores: skip this stage, sections may still separate
+            if not _is_flat(policy_scores, probe_policies):
+                keep = np.argsort(-policy_scores)[:probe_policies]
+                partitions = [partitions[i] for i in keep]
+                centroids = [centroids[i] for i in keep]
+
+        section_scores = np.concatenate([c.matrix @ query for c in centroids])
+        if _is_flat(section_scores, settings.vector_store_probe_sections):
+            return None
+        owners = np.repeat(np.arange(len(centroids)), [len(c.sections) for c in centroids])
+        offsets = np.cumsum([0] + [len(c.sections) for c in centroids])
+
+        # Best sections first, until enough are probed and they hold top_k live rows
+        chosen: Dict[int, List[int]] = {}
+        live = 0
+        for probed, index in enumerate(np.argsort(-section_scores)):
+            if probed >= settings.vector_store_probe_sections and live >= top_k:
+                break
+            owner = int(owners[index])
+            local = int(index - offsets[owner])
+            chosen.setdefault(owner, []).append(local)
+            live += int(centroids[owner].live[local])
+        return [
+            (partitions[owner], partitions[owner].section_rows(centroids[owner].sections[local]))
+            for owner, local in chosen.items()
+        ]
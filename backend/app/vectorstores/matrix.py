@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from typing import Optional
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+# Rows converted to float32 at a time when scanning compressed codes (cache-sized)
+_SCAN_BLOCK_ROWS = 4_096
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class GrowableArray:
+    """Row-appendable array that grows geometrically (amortized O(1) appends)."""
+
+    def __init__(self, dtype: np.dtype, width: Optional[int] = None) -> None:
+        self._dtype = np.dtype(dtype)
+        self._width = width
+        self._data: np.ndarray | None = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            shape = (0,) if self._width is None else (0, self._width or 0)
+            return np.empty(shape, dtype=self._dtype)
+        return self._data[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by stored rows (excludes spare capacity)."""
+        return 0 if self._data is None else self.data.nbytes
+
+    def append(self, rows: np.ndarray) -> None:
+        needed = self._size + len(rows)
+        if self._data is None:
+            if self._width is None and rows.ndim == 2:
+                self._width = rows.shape[1]
+            shape = (max(needed, 64),) + (() if rows.ndim == 1 else (rows.shape[1],))
+            self._data = np.empty(shape, dtype=self._dtype)
+        elif needed > len(self._data):
+            grown = np.empty((max(needed, 2 * len(self._data)),) + self._data.shape[1:], self._dtype)
+            grown[: self._size] = self._data[: self._size]
+            self._data = grown
+        self._data[self._size : needed] = rows
+        self._size = needed
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class DiskMatrix:
+    """Append-only float32 rows in a file, read back through np.memmap."""
+
+    def __init__(self, path: str, dim: int) -> None:
+        self._path = path
+        self._dim = dim
+        self._size = 0
+        self._map: np.memmap | None = None
+        open(path, "wb").close()
+        # Compaction replaces matrices; drop the file with the matrix
+        weakref.finalize(self, _remove, path)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, rows: np.ndarray) -> None:
+        with open(self._path, "ab") as f:
+            f.write(np.ascontiguousarray(rows, dtype=np.float32).tobytes())
+        self._size += len(rows)
+        self._map = None
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        if self._map is None:
+            self._map = np.memmap(self._path, dtype=np.float32, mode="r", shape=(self._size, self._dim))
+        return np.asarray(self._map[indices])
+
+
+class DenseMatrix:
+    """Full-precision float32 rows kept in RAM; scores are exact."""
+
+    exact = True
+
+    def __init__(self, dim: int) -> None:
+        self._rows = GrowableArray(np.float32, dim)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self._rows.nbytes
+
+    def append(self, rows: np.ndarray) -> None:
+        self._rows.append(rows)
+
+    def scores(
+        self, query: np.ndarray, indices: Optional[np.ndarray] = None, size: Optional[int] = None
+    ) -> np.ndarray:
+        rows = self._rows.data[:size]
+        return (rows if indices is None else rows[indices]) @ query
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        return self._rows.data[indices]
+
+
+class QuantizedMatrix:
+    """
+    Compressed codes in RAM for the first-pass scan, with full-precision rows
+    on disk (memmap) for rescoring the shortlist.
+
+    float16 halves memory; int8 stores one signed byte per dimension plus a
+    per-row scale (symmetric scalar quantization), roughly a 4x saving.
+    """
+
+    exact = False
+
+    def __init__(self, dim: int, mode: str, directory: str) -> None:
+        if mode not in ("float16", "int8"):
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self._mode = mode
+        self._codes = GrowableArray(np.float16 if mode == "float16" else np.int8, dim)
+        self._scales = GrowableArray(np.float32)
+        fd, path = tempfile.mkstemp(suffix=".f32", dir=directory)
+        os.close(fd)
+        self._full = DiskMatrix(path, dim)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self._codes.nbytes + self._scales.nbytes
+
+    def append(self, rows: np.ndarray) -> None:
+        if self._mode == "float16":
+            self._codes.append(rows.astype(np.float16))
+        else:
+            peak = np.abs(rows).max(axis=1)
+            peak[peak == 0] = 1.0
+            scale = (peak / 127.0).astype(np.float32)
+            self._codes.append(np.round(rows / scale[:, None]).astype(np.int8))
+            self._scales.append(scale)
+        self._full.append(rows)
+
+    def scores(
+        self, query: np.ndarray, indices: Optional[np.ndarray] = None, size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Scores of the first `size` rows (all by default), or of `indices`
+        only, in that order. Codes are appended before scales, so a scan
+        racing an append must pass the size both already hold.
+        """
+        codes = self._codes.data[:size]
+        if indices is not None:
+            codes = codes[indices]
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _SCAN_BLOCK_ROWS):
+            block = codes[start : start + _SCAN_BLOCK_ROWS]
+            out[start : start + len(block)] = block.astype(np.float32) @ query
+        if self._mode == "int8":
+            scales = self._scales.data[:size]
+            out *= scales if indices is None else scales[indices]
+        return out
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        return self._full.rows(indices)
+
+
+def make_matrix(dim: int, mode: str, directory: Optional[str] = None):
+    if mode == "none":
+        return DenseMatrix(dim)
+    return QuantizedMatrix(dim, mode, directory or tempfile.gettempdir())
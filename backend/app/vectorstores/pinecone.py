@@ -1,80 +1,523 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
-import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import time
 import logging
 
+import httpx
 from pinecone import Pinecone
 
+from app.catalog import Catalog
 from app.config import settings
+from app.metrics import metrics
 from app.schemas.models import ChunkMetadata, DocumentChunk
-from app.vectorstores.base import VectorStore
+from app.vectorstores.base import InvalidFilter, VectorStore
 
 logger = logging.getLogger(__name__)
 
+# HTTP statuses worth retrying: rate limiting and server-side hiccups
+_TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+# Allowance for the JSON envelope around each vector ({"id": .., "values": ..})
+_VECTOR_OVERHEAD_BYTES = 64
+
+PineconeVector = Tuple[str, List[float], Dict[str, Any]]
+# (score, vector id, namespace) of a query match, before text is resolved
+Match = Tuple[float, str, str]
+
+# Legacy vectors written before per-policy namespaces live here
+_DEFAULT_NAMESPACE = ""
+
+# Data-plane REST API version spoken by the async client
+_API_VERSION = "2024-07"
+
+# Most IDs Pinecone accepts in one delete request
+_DELETE_BATCH_SIZE = 1000
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in _TRANSIENT_STATUSES
+    status = getattr(error, "status", None)
+    if status is not None:
+        return int(status) in _TRANSIENT_STATUSES
+    # Connection resets / timeouts surface as urllib3, httpx or builtin errors
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError)) or (
+        type(error).__module__.startswith("urllib3")
+    )
+
+
+def _legacy_chunk(vector_id: str, metadata: Dict[str, Any]) -> DocumentChunk | None:
+    """Chunk from the metadata of a vector written when text lived in Pinecone."""
+    if "text" not in metadata:
+        return None
+    fields = {k: v for k, v in metadata.items() if k in ChunkMetadata.model_fields}
+    fields["page_number"] = int(fields.get("page_number", 0))
+    fields.setdefault("source_filename", "")
+    fields.setdefault("policy_id", "")
+    return DocumentChunk(id=vector_id, text=metadata["text"], metadata=ChunkMetadata(**fields))
+
+
+def _merge(results: List[List[Match]], top_k: int) -> List[Match]:
+    matches = [match for result in results for match in result]
+    matches.sort(key=lambda match: match[0], reverse=True)
+    return matches[:top_k]
+
+
+def _resolved(
+    matches: List[Match], chunks: Dict[str, DocumentChunk]
+) -> List[Tuple[float, DocumentChunk]]:
+    dropped = [vector_id for _, vector_id, _ in matches if vector_id not in chunks]
+    if dropped:
+        # Neither in the catalog nor fetchable with text: an ingest not committed
+        # yet, or vectors the catalog lost track of (a missed delete)
+        metrics.incr("pinecone_unresolved_matches_total", len(dropped))
+        logger.warning(
+            "Dropped %d Pinecone matches with no catalog entry or stored text: %s",
+            len(dropped),
+            ", ".join(dropped[:5]),
+        )
+    return [(score, chunks[vector_id]) for score, vector_id, _ in matches if vector_id in chunks]
+
+
+def _vector_size(vector: PineconeVector) -> int:
+    vector_id, values, metadata = vector
+    return (
+        len(vector_id)
+        + len(json.dumps(values))
+        + len(json.dumps(metadata).encode("utf-8"))
+        + _VECTOR_OVERHEAD_BYTES
+    )
+
+
+def _split_batches(
+    vectors: List[PineconeVector], max_count: int, max_bytes: int
+) -> List[List[PineconeVector]]:
+    """Group vectors into requests bounded both by count and by payload size."""
+    batches: List[List[PineconeVector]] = []
+    current: List[PineconeVector] = []
+    current_bytes = 0
+    for vector in vectors:
+        size = _vector_size(vector)
+        if current and (len(current) >= max_count or current_bytes + size > max_bytes):
+            batches.append(current)
+            current = []
+            current_bytes = 0
+        current.append(vector)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
 
 class PineconeVectorStore(VectorStore):
-    def __init__(self, namespace: str | None = None) -> None:
+    """
+    Pinecone holds the vectors plus the small, filterable metadata fields.
+    Chunk text and full metadata are resolved by ID from the local catalog
+    after a query, so upserts and query responses carry no text.
+    """
+
+    persistent = True
+
+    def __init__(self, catalog: Catalog, namespace: str | None = None) -> None:
         if not settings.pinecone_api_key or not settings.pinecone_index:
             raise ValueError("Pinecone is not configured")
 
-        client = Pinecone(api_key=settings.pinecone_api_key)
-        self._index = client.Index(settings.pinecone_index)
+        client = Pinecone(
+            api_key=settings.pinecone_api_key,
+            pool_threads=settings.pinecone_pool_threads,
+        )
+        self._host = client.describe_index(settings.pinecone_index).host
+        self._index = client.Index(
+            host=self._host, pool_threads=settings.pinecone_pool_threads
+        )
+        self._catalog = catalog
+        # Native asyncio client for the aadd/aquery paths (created on first use)
+        self._http: httpx.AsyncClient | None = None
+        # A fixed namespace keeps every policy together (scoped by metadata
+        # filter); otherwise each policy gets its own namespace.
         self._namespace = namespace
+        self._known_namespaces: set[str] | None = None
+        self._namespaces_read_at = 0.0
 
-    def add(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
-        vectors = []
+    def _build_vectors(
+        self, embeddings: List[List[float]], chunks: List[DocumentChunk]
+    ) -> List[PineconeVector]:
+        vectors: List[PineconeVector] = []
         for embedding, chunk in zip(embeddings, chunks):
             # Filter out None values from metadata (Pinecone doesn't accept nulls)
             metadata = {
                 k: v for k, v in chunk.metadata.model_dump().items() if v is not None
             }
-            metadata["text"] = chunk.text
+            vectors.append((chunk.id, embedding, metadata))
+        return vectors
 
-            vectors.append(
-                (
-                    str(uuid.uuid4()),
-                    embedding,
-                    metadata,
-                )
+    def _namespace_for(self, policy_id: str) -> str:
+        return self._namespace or policy_id
+
+    def _namespaces_stale(self) -> bool:
+        return (
+            self._known_namespaces is None
+            or time.monotonic() - self._namespaces_read_at > settings.pinecone_namespace_ttl
+        )
+
+    def _cache_namespaces(self, namespaces: Any) -> set[str]:
+        self._known_namespaces = set(namespaces or {})
+        self._namespaces_read_at = time.monotonic()
+        return self._known_namespaces
+
+    def _namespaces(self) -> set[str]:
+        if self._namespaces_stale():
+            return self._cache_namespaces(self._index.describe_index_stats().namespaces)
+        return self._known_namespaces
+
+    @staticmethod
+    def _fan_out(namespaces: set[str]) -> List[str]:
+        """Namespaces an unscoped query searches; one request each, so capped."""
+        namespaces = sorted(namespaces | {_DEFAULT_NAMESPACE})
+        if len(namespaces) > settings.pinecone_max_fanout:
+            raise InvalidFilter(
+                f"An unscoped search would query {len(namespaces)} Pinecone namespaces "
+                f"(PINECONE_MAX_FANOUT={settings.pinecone_max_fanout}); scope it to a "
+                "policy, or set PINECONE_NAMESPACE to keep every policy in one namespace"
             )
+        return namespaces
+
+    def _group_batches(
+        self, vectors: List[PineconeVector], chunks: List[DocumentChunk]
+    ) -> List[Tuple[str, List[PineconeVector]]]:
+        by_namespace: Dict[str, List[PineconeVector]] = {}
+        for vector, chunk in zip(vectors, chunks):
+            namespace = self._namespace_for(chunk.metadata.policy_id)
+            by_namespace.setdefault(namespace, []).append(vector)
+
+        return [
+            (namespace, batch)
+            for namespace, grouped in by_namespace.items()
+            for batch in _split_batches(
+                grouped,
+                max_count=settings.pinecone_upsert_batch_size,
+                max_bytes=settings.pinecone_max_request_bytes,
+            )
+        ]
+
+    def _scope(
+        self,
+        metadata_filter: Optional[Dict[str, str]],
+        policy_ids: Optional[List[str]],
+    ) -> Tuple[Optional[List[str]], Dict[str, Any]]:
+        """Namespaces to search (None = all known) and the filter to send."""
+        query_filter: Dict[str, Any] = dict(metadata_filter or {})
+        if self._namespace:
+            if policy_ids is not None:
+                query_filter["policy_id"] = {"$in": policy_ids}
+            return [self._namespace], query_filter
+        if policy_ids is not None:
+            return [self._namespace_for(policy_id) for policy_id in policy_ids], query_filter
+        return None, query_filter
+
+    def _log_throughput(self, count: int, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Successfully upserted %d vectors to Pinecone in %.2fs (%.1f vectors/sec)",
+            count,
+            elapsed,
+            count / elapsed if elapsed > 0 else float("inf"),
+        )
+
+    def _submit(self, namespace: str, batch: List[PineconeVector]):
+        kwargs: Dict[str, Any] = {"vectors": batch, "async_req": True}
+        if namespace:
+            kwargs["namespace"] = namespace
+        return self._index.upsert(**kwargs)
+
+    def add(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
+        vectors = self._build_vectors(embeddings, chunks)
+        if not vectors:
+            return
+
+        batches = self._group_batches(vectors, chunks)
         logger.info(
-            "Upserting %d vectors to Pinecone (namespace=%s)",
+            "Upserting %d vectors to Pinecone in %d batches",
             len(vectors),
-            self._namespace,
+            len(batches),
         )
-        if self._namespace:
-            self._index.upsert(vectors=vectors, namespace=self._namespace)
-        else:
-            self._index.upsert(vectors=vectors)
-        logger.info("Successfully upserted %d vectors to Pinecone", len(vectors))
+
+        started = time.perf_counter()
+        pending = batches
+        for attempt in range(settings.pinecone_upsert_retries + 1):
+            # Fire every batch at once; the index's thread pool bounds concurrency
+            in_flight = [(item, self._submit(*item)) for item in pending]
+            failed: List[Tuple[str, List[PineconeVector]]] = []
+            last_error: Exception | None = None
+            for item, result in in_flight:
+                try:
+                    result.get()
+                except Exception as error:
+                    if not _is_transient(error):
+                        raise
+                    last_error = error
+                    failed.append(item)
+
+            if not failed:
+                break
+            if attempt == settings.pinecone_upsert_retries:
+                raise RuntimeError(
+                    f"Pinecone upsert failed for {len(failed)} batches after "
+                    f"{attempt + 1} attempts"
+                ) from last_error
+
+            delay = settings.pinecone_retry_backoff * (2**attempt)
+            logger.warning(
+                "Retrying %d failed Pinecone batches in %.2fs (%s)",
+                len(failed),
+                delay,
+                last_error,
+            )
+            time.sleep(delay)
+            pending = failed
+
+        if self._known_namespaces is not None:
+            self._known_namespaces.update(namespace for namespace, _ in batches)
+        self._log_throughput(len(vectors), started)
 
     def query(
         self,
         query_embedding: List[float],
         top_k: int = 5,
         metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
     ) -> List[Tuple[float, DocumentChunk]]:
-        response = self._index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True,
-            filter=metadata_filter or {},
-            namespace=self._namespace,
+        namespaces, query_filter = self._scope(metadata_filter, policy_ids)
+        if namespaces is None:
+            namespaces = self._fan_out(self._namespaces())
+
+        # One query per namespace, issued concurrently over the pool threads
+        in_flight = [
+            self._index.query(
+                vector=query_embedding,
+                top_k=top_k,
+                include_metadata=False,
+                filter=query_filter,
+                namespace=namespace,
+                async_req=True,
+            )
+            for namespace in namespaces
+        ]
+
+        results = []
+        for namespace, result in zip(namespaces, in_flight):
+            response = result.get()
+            results.append([(float(m.score), m.id, namespace) for m in response.matches])
+        matches = _merge(results, top_k)
+
+        chunks = self._catalog.get_chunks([vector_id for _, vector_id, _ in matches])
+        for namespace, ids in self._unresolved(matches, chunks).items():
+            response = self._index.fetch(ids=ids, namespace=namespace)
+            self._add_legacy(chunks, {v.id: v.metadata or {} for v in response.vectors.values()})
+        return _resolved(matches, chunks)
+
+    def delete(self, policy_id: Optional[str] = None, ids: Optional[List[str]] = None) -> None:
+        by_namespace: Dict[str, List[str]] = {}
+        if policy_id is not None:
+            if self._namespace:
+                by_namespace[self._namespace] = self._catalog.chunk_ids(policy_id)
+            else:
+                # Issued whatever the cached namespace list says: another
+                # process may have created the namespace since it was read
+                try:
+                    self._index.delete(delete_all=True, namespace=policy_id)
+                except Exception as error:
+                    if getattr(error, "status", None) != 404:
+                        raise
+                    # No such namespace: nothing to delete
+                self._known_namespaces = None
+                if _DEFAULT_NAMESPACE in self._namespaces():
+                    self._delete_legacy(policy_id)
+        if ids:
+            chunks = self._catalog.get_chunks(ids)
+            for chunk_id in ids:
+                chunk = chunks.get(chunk_id)
+                namespace = (
+                    self._namespace_for(chunk.metadata.policy_id)
+                    if chunk is not None
+                    else self._namespace or _DEFAULT_NAMESPACE
+                )
+                by_namespace.setdefault(namespace, []).append(chunk_id)
+
+        for namespace, namespace_ids in by_namespace.items():
+            for start in range(0, len(namespace_ids), _DELETE_BATCH_SIZE):
+                kwargs: Dict[str, Any] = {"ids": namespace_ids[start : start + _DELETE_BATCH_SIZE]}
+                if namespace:
+                    kwargs["namespace"] = namespace
+                self._index.delete(**kwargs)
+        logger.info(
+            "Deleted from Pinecone policy_id=%s ids=%d",
+            policy_id,
+            sum(len(v) for v in by_namespace.values()),
+        )
+
+    def _delete_legacy(self, policy_id: str) -> None:
+        """
+        Delete a policy's vectors from the default namespace by metadata.
+        Vectors written before the catalog have random IDs it never recorded,
+        so deleting by catalog ID would leave them behind.
+        """
+        policy_filter = {"policy_id": policy_id}
+        try:
+            self._index.delete(filter=policy_filter)
+            return
+        except Exception as error:
+            # Serverless indexes reject deletes by metadata filter
+            if getattr(error, "status", None) != 400:
+                raise
+        # Find the IDs with filtered queries instead (any probe vector will do)
+        probe = [1.0] * self._index.describe_index_stats().dimension
+        deleted: set[str] = set()
+        while True:
+            response = self._index.query(
+                vector=probe, top_k=_DELETE_BATCH_SIZE, filter=policy_filter, include_metadata=False
+            )
+            # Deletes are eventually consistent: stop once a query finds nothing new
+            ids = [match.id for match in response.matches if match.id not in deleted]
+            if not ids:
+                break
+            self._index.delete(ids=ids)
+            deleted.update(ids)
+
+    @staticmethod
+    def _unresolved(matches: List[Match], chunks: Dict[str, DocumentChunk]) -> Dict[str, List[str]]:
+        """IDs missing from the catalog, by namespace (vectors from before the catalog)."""
+        missing: Dict[str, List[str]] = {}
+        for _, vector_id, namespace in matches:
+            if vector_id not in chunks:
+                missing.setdefault(namespace, []).append(vector_id)
+        return missing
+
+    @staticmethod
+    def _add_legacy(chunks: Dict[str, DocumentChunk], fetched: Dict[str, Dict[str, Any]]) -> None:
+        for vector_id, metadata in fetched.items():
+            chunk = _legacy_chunk(vector_id, metadata)
+            if chunk is not None:
+                chunks[vector_id] = chunk
+
+    # -- asyncio ----------------------------------------------------------------
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=f"https://{self._host}",
+                headers={
+                    "Api-Key": settings.pinecone_api_key or "",
+                    "X-Pinecone-API-Version": _API_VERSION,
+                },
+                limits=httpx.Limits(max_connections=settings.pinecone_pool_threads),
+                timeout=30.0,
+            )
+        return self._http
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self._client().post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def _anamespaces(self) -> set[str]:
+        if self._namespaces_stale():
+            stats = await self._post("/describe_index_stats", {})
+            return self._cache_namespaces(stats.get("namespaces"))
+        return self._known_namespaces
+
+    async def _aupsert(self, namespace: str, batch: List[PineconeVector]) -> None:
+        payload: Dict[str, Any] = {
+            "vectors": [
+                {"id": vector_id, "values": list(values), "metadata": metadata}
+                for vector_id, values, metadata in batch
+            ]
+        }
+        if namespace:
+            payload["namespace"] = namespace
+        for attempt in range(settings.pinecone_upsert_retries + 1):
+            try:
+                await self._post("/vectors/upsert", payload)
+                return
+            except Exception as error:
+                if not _is_transient(error):
+                    raise
+                if attempt == settings.pinecone_upsert_retries:
+                    raise RuntimeError(
+                        f"Pinecone upsert failed after {attempt + 1} attempts"
+                    ) from error
+                delay = settings.pinecone_retry_backoff * (2**attempt)
+                logger.warning("Retrying Pinecone batch in %.2fs (%s)", delay, error)
+                await asyncio.sleep(delay)
+
+    async def aadd(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
+        vectors = self._build_vectors(embeddings, chunks)
+        if not vectors:
+            return
+        batches = self._group_batches(vectors, chunks)
+        started = time.perf_counter()
+        # The connection limit on the client bounds how many run at once
+        await asyncio.gather(*(self._aupsert(namespace, batch) for namespace, batch in batches))
+        if self._known_namespaces is not None:
+            self._known_namespaces.update(namespace for namespace, _ in batches)
+        self._log_throughput(len(vectors), started)
+
+    async def _aquery_namespace(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        query_filter: Dict[str, Any],
+        namespace: str,
+    ) -> List[Match]:
+        payload: Dict[str, Any] = {
+            "vector": list(query_embedding),
+            "topK": top_k,
+            "includeMetadata": False,
+            "namespace": namespace,
+        }
+        if query_filter:
+            payload["filter"] = query_filter
+        response = await self._post("/query", payload)
+        return [
+            (float(match["score"]), match["id"], namespace)
+            for match in response.get("matches", [])
+        ]
+
+    async def _afetch(self, namespace: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        response = await self._client().get(
+            "/vectors/fetch", params={"ids": ids, "namespace": namespace}
         )
+        response.raise_for_status()
+        vectors = response.json().get("vectors") or {}
+        return {vector_id: vector.get("metadata") or {} for vector_id, vector in vectors.items()}
 
-        scored: List[Tuple[float, DocumentChunk]] = []
-        for match in response.matches:
-            metadata = match.metadata or {}
-            chunk = DocumentChunk(
-                text=metadata.get("text", ""),
-                metadata=ChunkMetadata(
-                    page_number=int(metadata.get("page_number", 0)),
-                    source_filename=str(metadata.get("source_filename", "")),
-                    policy_id=str(metadata.get("policy_id", "")),
-                    section=metadata.get("section"),
-                ),
+    async def aquery(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[float, DocumentChunk]]:
+        namespaces, query_filter = self._scope(metadata_filter, policy_ids)
+        if namespaces is None:
+            namespaces = self._fan_out(await self._anamespaces())
+        results = await asyncio.gather(
+            *(
+                self._aquery_namespace(query_embedding, top_k, query_filter, namespace)
+                for namespace in namespaces
             )
-            scored.append((float(match.score), chunk))
+        )
+        matches = _merge(list(results), top_k)
 
-        return scored
+        chunks = await asyncio.to_thread(
+            self._catalog.get_chunks, [vector_id for _, vector_id, _ in matches]
+        )
+        missing = self._unresolved(matches, chunks)
+        for fetched in await asyncio.gather(
+            *(self._afetch(namespace, ids) for namespace, ids in missing.items())
+        ):
+            self._add_legacy(chunks, fetched)
+        return _resolved(matches, chunks)
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import heapq
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+
+import numpy as np
+
+from app.config import settings
+from app.schemas.models import DocumentChunk
+from app.vectorstores.base import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# (embeddings, chunks) batches of one policy, used to refill a restarted shard
+Reload = Callable[[str], Iterable[Tuple[Any, List[DocumentChunk]]]]
+
+
+def _serve(conn) -> None:
+    """Shard worker: owns an InMemoryVectorStore and answers coordinator calls."""
+    from app.vectorstores.in_memory import InMemoryVectorStore
+
+    store = InMemoryVectorStore()
+    ops = {
+        "add": store.add,
+        "query": store.query,
+        "delete": store.delete,
+        "pop_policy": store.pop_policy,
+        "nbytes": lambda: store.nbytes,
+    }
+    while True:
+        op, args = conn.recv()
+        if op == "stop":
+            conn.close()
+            return
+        try:
+            conn.send((True, ops[op](*args)))
+        except Exception as e:
+            conn.send((False, e))
+
+
+def _owner(policy_id: str, shard_count: int) -> int:
+    """
+    Rendezvous (highest-random-weight) hashing: stable across processes, and
+    adding shard n only moves the policies that now rank shard n highest.
+    """
+    def weight(shard: int) -> bytes:
+        return hashlib.blake2b(f"{shard}:{policy_id}".encode("utf-8"), digest_size=8).digest()
+
+    return max(range(shard_count), key=weight)
+
+
+class _Shard:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        # One request/response exchange at a time per pipe
+        self.lock = threading.Lock()
+        self.start()
+
+    def start(self) -> None:
+        context = multiprocessing.get_context("spawn")
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_serve, args=(child,), name=f"vector-shard-{self.index}", daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def send(self, op: str, *args: Any) -> Optional[Exception]:
+        try:
+            self.conn.send((op, args))
+        except OSError as e:  # BrokenPipeError: the worker is gone
+            return e
+        return None
+
+    def receive(self) -> Tuple[bool, Any]:
+        """The (ok, result) reply to the last send; (False, error) if the worker died."""
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            return False, e
+
+    def call(self, op: str, *args: Any) -> Any:
+        """One exchange; the caller holds the lock."""
+        error = self.send(op, *args)
+        ok, result = (False, error) if error else self.receive()
+        if not ok:
+            raise result
+        return result
+
+
+def _stop(shards: List[_Shard]) -> None:
+    for shard in shards:
+        try:
+            shard.send("stop")
+        except (BrokenPipeError, OSError):
+            pass
+    for shard in shards:
+        shard.process.join(timeout=5)
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    Local store partitioned across worker processes by policy_id.
+
+    Each shard process holds an InMemoryVectorStore for the policies that
+    hash to it. A query is sent to every shard that can hold matches (only
+    the owners of policy_ids when scoped), the shards scan in parallel on
+    their own cores, and the coordinator merges their top-k lists. Shards
+    can be added at runtime with add_shard(); only the policies the new
+    shard now owns are moved. A shard process that dies is restarted, and
+    its policies are refilled through `reload` (the catalog in the app).
+    """
+
+    def __init__(self, shards: Optional[int] = None, reload: Optional[Reload] = None) -> None:
+        count = shards or settings.sharded_store_shards or os.cpu_count() or 1
+        self._shards: List[_Shard] = [_Shard(i) for i in range(count)]
+        self._owners: Dict[str, int] = {}
+        self._reload = reload
+        weakref.finalize(self, _stop, self._shards)
+        logger.info("Started %d vector store shards", count)
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._shards)
+
+    @property
+    def nbytes(self) -> int:
+        results = self._scatter({i: ("nbytes", ()) for i in range(len(self._shards))})
+        return sum(results.values())
+
+    def _scatter(self, requests: Dict[int, Tuple[str, tuple]]) -> Dict[int, Any]:
+        """
+        Send every request before waiting on any, so shards work in parallel.
+        Every reply is read before the first error is raised: a reply left in
+        a pipe would be taken as the answer to the next request.
+        """
+        targets = [self._shards[index] for index in sorted(requests)]
+        with ExitStack() as stack:
+            # Fixed lock order: concurrent scatters cannot deadlock
+            for shard in targets:
+                stack.enter_context(shard.lock)
+            failed = {}
+            for shard in targets:
+                op, args = requests[shard.index]
+                error = shard.send(op, *args)
+                if error:
+                    failed[shard.index] = (False, error)
+            replies = {
+                shard.index: failed.get(shard.index) or shard.receive() for shard in targets
+            }
+            for shard in targets:
+                if not shard.process.is_alive():
+                    replies[shard.index] = (False, self._restart(shard))
+
+        errors = [result for ok, result in replies.values() if not ok]
+        if errors:
+            raise errors[0]
+        return {index: result for index, (_, result) in replies.items()}
+
+    def _restart(self, shard: _Shard) -> Exception:
+        """Replace a dead shard process and refill its policies; the caller holds its lock."""
+        exitcode = shard.process.exitcode
+        shard.conn.close()
+        shard.start()
+        policies = [p for p, owner in list(self._owners.items()) if owner == shard.index]
+        reloaded = 0
+        if self._reload is not None:
+            for policy_id in policies:
+                for embeddings, chunks in self._reload(policy_id):
+                    shard.call("add", np.asarray(embeddings, dtype=np.float32), chunks)
+                reloaded += 1
+        else:
+            # Nothing to refill from: let re-ingests place these policies again
+            for policy_id in policies:
+                self._owners.pop(policy_id, None)
+        logger.error(
+            "Vector store shard %d exited (code %s); restarted and reloaded %d of %d policies",
+            shard.index,
+            exitcode,
+            reloaded,
+            len(policies),
+        )
+        return RuntimeError(f"Vector store shard {shard.index} exited (code {exitcode})")
+
+    def _owner_of(self, policy_id: str) -> int:
+        owner = self._owners.get(policy_id)
+        if owner is None:
+            owner = _owner(policy_id, len(self._shards))
+            self._owners[policy_id] = owner
+        return owner
+
+    def add(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
+        by_shard: Dict[int, List[int]] = {}
+        for index, chunk in enumerate(chunks):
+            by_shard.setdefault(self._owner_of(chunk.metadata.policy_id), []).append(index)
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        self._scatter(
+            {
+                shard: ("add", (matrix[indices], [chunks[i] for i in indices]))
+                for shard, indices in by_shard.items()
+            }
+        )
+
+    def query(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[float, DocumentChunk]]:
+        if policy_ids is None:
+            targets = set(range(len(self._shards)))
+        else:
+            targets = {self._owners[p] for p in policy_ids if p in self._owners}
+        if not targets:
+            return []
+
+        args = (np.asarray(query_embedding, dtype=np.float32), top_k, metadata_filter, policy_ids)
+        results = self._scatter({shard: ("query", args) for shard in targets})
+        merged = heapq.merge(*results.values(), key=lambda item: item[0], reverse=True)
+        return list(merged)[:top_k]
+
+    def delete(self, policy_id: Optional[str] = None, ids: Optional[List[str]] = None) -> None:
+        owner = self._owners.pop(policy_id, None) if policy_id is not None else None
+        # Any shard may hold a given chunk ID; a policy lives on its owner only
+        targets = range(len(self._shards)) if ids else ([] if owner is None else [owner])
+        self._scatter(
+            {shard: ("delete", (policy_id if shard == owner else None, ids)) for shard in targets}
+        )
+
+    def add_shard(self) -> int:
+        """Start one more shard and move the policies it now owns; returns how many moved."""
+        with ExitStack() as stack:
+            # Block queries and adds while policies are in transit
+            for shard in self._shards:
+                stack.enter_context(shard.lock)
+
+            new = _Shard(len(self._shards))
+            moving = [p for p in self._owners if _owner(p, len(self._shards) + 1) == new.index]
+            for policy_id in moving:
+                source = self._shards[self._owners[policy_id]]
+                embeddings, chunks = source.call("pop_policy", policy_id)
+                if chunks:
+                    new.call("add", embeddings, chunks)
+                self._owners[policy_id] = new.index
+            self._shards.append(new)
+
+        logger.info("Added vector store shard %d; moved %d policies", new.index, len(moving))
+        return len(moving)
@@ -0,0 +1,552 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.schemas.models import ChunkMetadata, DocumentChunk
+from app.vectorstores.base import VectorStore, page_number_filter
+from app.vectorstores.matrix import normalize
+
+logger = logging.getLogger(__name__)
+
+# header.u64 slots: generation, committed row count, embedding dimension,
+# data epoch (bumped by compaction), committed policy count
+_GENERATION, _ROWS, _DIM, _EPOCH, _POLICIES = 0, 1, 2, 3, 4
+_HEADER_SLOTS = 5
+
+_DATA_FILES = (
+    "vectors.f32",
+    "codes.i32",
+    "offsets.u64",
+    "records.bin",
+    "policies.txt",
+    "deleted.u8",
+    "ids.u64",
+    "ids.idx",
+)
+# Rows copied at a time when compacting
+_COMPACT_BLOCK_ROWS = 65_536
+# ids.idx: open-addressing (hash, row) slots, kept at most this full
+_ID_TABLE_LOAD = 0.5
+
+
+def _id_hash(chunk_id: str) -> int:
+    digest = hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1  # 0 marks an empty slot
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Immutable view of the index at one generation; queries never lock."""
+
+    generation: int = -1
+    epoch: int = 0
+    rows: int = 0
+    vectors: Optional[np.ndarray] = None
+    offsets: Optional[np.ndarray] = None
+    records: Optional[np.ndarray] = None
+    deleted: Optional[np.ndarray] = None
+    policy_codes: Dict[str, int] = field(default_factory=dict)
+    policy_rows: Dict[int, np.ndarray] = field(default_factory=dict)
+
+
+class SharedVectorStore(VectorStore):
+    """
+    Vector index in memory-mapped files shared by every worker process.
+
+    Layout under settings.shared_store_dir:
+      header.u64    generation counter, committed row and policy counts,
+                    dimension, epoch
+      vectors.f32   L2-normalized embeddings, one row per chunk
+      codes.i32     policy code per row (index into policies.txt)
+      offsets.u64   (start, length) of each row's record in records.bin
+      records.bin   JSON chunk id, text and metadata
+      policies.txt  policy ids, one per line
+      deleted.u8    tombstone flag per row
+      ids.u64       hash of each row's chunk id
+      ids.idx       hash table from chunk id hash to row (writers only)
+
+    Ingest follows a single-writer protocol: the writer holds an exclusive
+    flock, appends to the data files, and only then publishes the new row
+    and policy counts. Publishing is a seqlock: the generation is odd while
+    header slots are being written. Readers compare the generation on each
+    query and remap when it has moved, so the query path takes no locks and
+    never sees a partially written batch or a torn header. Bytes past the
+    committed counts (a crashed writer's) are ignored and trimmed by the
+    next writer.
+
+    Deletes set tombstone flags in place, finding rows by chunk ID through
+    ids.idx. Adding an ID that is already present replaces its previous
+    row. Once enough rows are tombstoned,
+    compaction writes the live rows to a new epoch directory (epoch-N/) and
+    publishes it like a batch; readers move over on their next query.
+    """
+
+    persistent = True
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        try:
+            import fcntl  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("The shared vector store requires a POSIX system") from e
+
+        self._dir = directory or settings.shared_store_dir
+        os.makedirs(self._dir, exist_ok=True)
+
+        header_path = self._path("header.u64")
+        with self._writer_lock():
+            open(header_path, "ab").close()
+            size = os.path.getsize(header_path)
+            if size < _HEADER_SLOTS * 8:
+                # Headers of older layouts are padded: the new slots start at zero
+                with open(header_path, "ab") as f:
+                    f.write(bytes(_HEADER_SLOTS * 8 - size))
+            self._header = np.memmap(header_path, dtype=np.uint64, mode="r+", shape=(_HEADER_SLOTS,))
+            if int(self._header[_GENERATION]) % 2:
+                # Odd: a writer died mid-publish, or a pre-seqlock index
+                self._header[_GENERATION] = int(self._header[_GENERATION]) + 1
+                self._header.flush()
+            for name in _DATA_FILES:
+                open(self._data_path(name), "ab").close()
+            rows = int(self._header[_ROWS])
+            # Indexes written before deletes existed have no tombstones yet
+            tombstones = self._data_path("deleted.u8")
+            if os.path.getsize(tombstones) < rows:
+                os.truncate(tombstones, rows)
+            if 0 < size < (_POLICIES + 1) * 8 and rows:
+                # Before the policy count was recorded: codes are assigned in order
+                codes = np.fromfile(self._data_path("codes.i32"), dtype=np.int32, count=rows)
+                self._publish({_POLICIES: int(codes.max()) + 1})
+            if os.path.getsize(self._data_path("ids.u64")) < rows * 8:
+                # Indexes written before the ID sidecar: hash the stored IDs once
+                hashes = [_id_hash(self._record_id(row)) for row in range(rows)]
+                with open(self._data_path("ids.u64"), "wb") as f:
+                    f.write(np.asarray(hashes, dtype=np.uint64).tobytes())
+        self._snapshot = _Snapshot()
+        self._refresh_lock = threading.Lock()
+        self._compacting = threading.Event()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._dir, name)
+
+    def _epoch_dir(self, epoch: int) -> str:
+        # Epoch 0 is the top-level directory (indexes from before compaction)
+        return self._dir if epoch == 0 else self._path(f"epoch-{epoch}")
+
+    def _data_path(self, name: str, epoch: Optional[int] = None) -> str:
+        epoch = int(self._header[_EPOCH]) if epoch is None else epoch
+        return os.path.join(self._epoch_dir(epoch), name)
+
+    @contextmanager
+    def _writer_lock(self) -> Iterator[None]:
+        import fcntl
+
+        with open(self._path("writer.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # -- writer ---------------------------------------------------------------
+
+    def _publish(self, slots: Dict[int, int]) -> None:
+        """Write header slots and move the generation, odd while writing (seqlock)."""
+        self._header[_GENERATION] = int(self._header[_GENERATION]) + 1
+        for slot, value in slots.items():
+            self._header[slot] = value
+        self._header[_GENERATION] = int(self._header[_GENERATION]) + 1
+        self._header.flush()
+
+    def _committed_policies(self) -> List[str]:
+        """policies.txt trimmed to the committed policy count (writer lock held)."""
+        path = self._data_path("policies.txt")
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        committed = lines[: int(self._header[_POLICIES])]
+        if len(lines) > len(committed):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("".join(p + "\n" for p in committed))
+        return committed
+
+    def _truncate_to_committed(self, rows: int, dim: int) -> int:
+        """Drop bytes a crashed writer appended past the committed row count."""
+        os.truncate(self._data_path("vectors.f32"), rows * dim * 4)
+        os.truncate(self._data_path("codes.i32"), rows * 4)
+        os.truncate(self._data_path("offsets.u64"), rows * 16)
+        os.truncate(self._data_path("deleted.u8"), rows)
+        os.truncate(self._data_path("ids.u64"), rows * 8)
+        records_end = 0
+        if rows:
+            offsets = np.fromfile(self._data_path("offsets.u64"), dtype=np.uint64)
+            records_end = int(offsets[-2] + offsets[-1])
+        os.truncate(self._data_path("records.bin"), records_end)
+        return records_end
+
+    def add(self, embeddings: List[List[float]], chunks: List[DocumentChunk]) -> None:
+        if not chunks:
+            return
+        matrix = normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._writer_lock():
+            rows = int(self._header[_ROWS])
+            dim = int(self._header[_DIM]) or matrix.shape[1]
+            if matrix.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match index ({dim})")
+            records_end = self._truncate_to_committed(rows, dim)
+
+            policies = self._committed_policies()
+            codes = {policy_id: code for code, policy_id in enumerate(policies)}
+            new_policies = []
+            for chunk in chunks:
+                if chunk.metadata.policy_id not in codes:
+                    codes[chunk.metadata.policy_id] = len(codes)
+                    new_policies.append(chunk.metadata.policy_id)
+
+            payloads = [
+                json.dumps(
+                    {"id": c.id, "text": c.text, "metadata": c.metadata.model_dump(exclude_none=True)}
+                ).encode("utf-8")
+                for c in chunks
+            ]
+            lengths = np.array([len(p) for p in payloads], dtype=np.uint64)
+            starts = records_end + np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.uint64)
+
+            with open(self._data_path("records.bin"), "ab") as f:
+                f.write(b"".join(payloads))
+            with open(self._data_path("offsets.u64"), "ab") as f:
+                f.write(np.column_stack([starts, lengths]).astype(np.uint64).tobytes())
+            with open(self._data_path("codes.i32"), "ab") as f:
+                f.write(np.array([codes[c.metadata.policy_id] for c in chunks], dtype=np.int32).tobytes())
+            with open(self._data_path("vectors.f32"), "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self._data_path("deleted.u8"), "ab") as f:
+                f.write(bytes(len(chunks)))
+            hashes = [_id_hash(c.id) for c in chunks]
+            with open(self._data_path("ids.u64"), "ab") as f:
+                f.write(np.asarray(hashes, dtype=np.uint64).tobytes())
+            if new_policies:
+                with open(self._data_path("policies.txt"), "a", encoding="utf-8") as f:
+                    f.write("".join(p + "\n" for p in new_policies))
+
+            replaced = self._find_rows(rows, [c.id for c in chunks])
+            self._index_ids(rows, hashes)
+            self._publish({_DIM: dim, _ROWS: rows + len(chunks), _POLICIES: len(codes)})
+            if len(replaced):
+                # After the new rows are published, so a replaced chunk is never missing
+                self._tombstone(rows + len(chunks), replaced)
+
+        logger.info("Appended %d chunks to shared index (rows=%d)", len(chunks), rows + len(chunks))
+
+    def _record_id(self, row: int) -> str:
+        offsets = np.fromfile(self._data_path("offsets.u64"), dtype=np.uint64, count=2, offset=row * 16)
+        with open(self._data_path("records.bin"), "rb") as f:
+            f.seek(int(offsets[0]))
+            return json.loads(f.read(int(offsets[1])))["id"]
+
+    def _id_table(self, needed: int) -> np.memmap:
+        """ids.idx as a (capacity, 2) memmap, rebuilt larger from ids.u64 when too full."""
+        path = self._data_path("ids.idx")
+        capacity = os.path.getsize(path) // 16
+        if needed > _ID_TABLE_LOAD * capacity:
+            capacity = 1 << max(10, int(np.ceil(np.log2(needed / _ID_TABLE_LOAD))) + 1)
+            hashes = np.fromfile(self._data_path("ids.u64"), dtype=np.uint64)
+            table = np.zeros((capacity, 2), dtype=np.uint64)
+            for row, key in enumerate(hashes.tolist()):
+                table[self._slot(table, key)] = (key, row)
+            # Replaced whole: a crash never leaves a half-built table
+            table.tofile(path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return np.memmap(path, dtype=np.uint64, mode="r+", shape=(capacity, 2))
+
+    @staticmethod
+    def _slot(table: np.ndarray, key: int) -> int:
+        """Linear probing: the slot holding `key`, or the empty slot it would go in."""
+        mask = len(table) - 1
+        slot = key & mask
+        while True:
+            stored = int(table[slot, 0])
+            if stored == 0 or stored == key:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _index_ids(self, start: int, hashes: List[int]) -> None:
+        table = self._id_table(start + len(hashes))
+        for row, key in enumerate(hashes, start=start):
+            table[self._slot(table, key)] = (key, row)  # latest row of an ID wins
+        table.flush()
+
+    def _find_rows(self, rows: int, ids: List[str]) -> np.ndarray:
+        """Live rows (below `rows`) holding the given chunk IDs, via ids.idx."""
+        if not rows or not ids:
+            return np.empty(0, dtype=np.int64)
+        table = self._id_table(rows)
+        deleted = np.memmap(self._data_path("deleted.u8"), dtype=np.uint8, mode="r", shape=(rows,))
+        found = []
+        for chunk_id in set(ids):
+            key = _id_hash(chunk_id)
+            slot = self._slot(table, key)
+            row = int(table[slot, 1])
+            if int(table[slot, 0]) == key and row < rows and self._record_id(row) == chunk_id:
+                candidates = [row]
+            elif int(table[slot, 0]) == key:
+                # Hash shared with another ID (or a row a crashed writer left): scan
+                hashes = np.fromfile(self._data_path("ids.u64"), dtype=np.uint64, count=rows)
+                candidates = [
+                    int(r) for r in np.flatnonzero(hashes == key) if self._record_id(int(r)) == chunk_id
+                ]
+            else:
+                candidates = []
+            found.extend(r for r in candidates if not deleted[r])
+        return np.asarray(found, dtype=np.int64)
+
+    def _tombstone(self, rows: int, doomed: np.ndarray) -> int:
+        """Flag rows deleted in place and publish; returns the dead row count."""
+        deleted = np.memmap(self._data_path("deleted.u8"), dtype=np.uint8, mode="r+", shape=(rows,))
+        deleted[doomed] = 1
+        deleted.flush()
+        dead = int(np.count_nonzero(deleted))
+        del deleted
+        self._publish({})
+        return dead
+
+    def delete(self, policy_id: Optional[str] = None, ids: Optional[List[str]] = None) -> None:
+        with self._writer_lock():
+            rows = int(self._header[_ROWS])
+            if not rows:
+                return
+            doomed = [self._find_rows(rows, ids or [])]
+            if policy_id is not None:
+                policies = self._committed_policies()
+                if policy_id in policies:
+                    codes = np.fromfile(self._data_path("codes.i32"), dtype=np.int32, count=rows)
+                    doomed.append(np.flatnonzero(codes == policies.index(policy_id)))
+            doomed_rows = np.concatenate(doomed)
+            if not len(doomed_rows):
+                return
+
+            dead = self._tombstone(rows, doomed_rows)
+
+        logger.info("Tombstoned %d rows in shared index (%d of %d dead)", len(doomed_rows), dead, rows)
+        if dead > settings.vector_store_compact_ratio * rows and not self._compacting.is_set():
+            self._compacting.set()
+            threading.Thread(target=self._compact, name="shared-compaction", daemon=True).start()
+
+    def _compact(self) -> None:
+        """
+        Copy the live rows into a new epoch directory and publish it. Holds the
+        writer lock (ingest waits) but readers keep querying the old epoch.
+        """
+        try:
+            with self._writer_lock():
+                epoch = int(self._header[_EPOCH])
+                rows = int(self._header[_ROWS])
+                dim = int(self._header[_DIM])
+                live = np.flatnonzero(
+                    np.fromfile(self._data_path("deleted.u8"), dtype=np.uint8, count=rows) == 0
+                )
+                target = self._epoch_dir(epoch + 1)
+                shutil.rmtree(target, ignore_errors=True)
+                os.makedirs(target)
+
+                vectors = np.memmap(self._data_path("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, dim))
+                codes = np.fromfile(self._data_path("codes.i32"), dtype=np.int32, count=rows)
+                offsets = np.fromfile(self._data_path("offsets.u64"), dtype=np.uint64, count=rows * 2).reshape(rows, 2)
+                policies = self._committed_policies()
+                with open(os.path.join(target, "policies.txt"), "w", encoding="utf-8") as f:
+                    f.write("".join(p + "\n" for p in policies))
+
+                written = 0
+                with open(self._data_path("records.bin"), "rb") as source, open(
+                    os.path.join(target, "vectors.f32"), "wb"
+                ) as out_vectors, open(os.path.join(target, "codes.i32"), "wb") as out_codes, open(
+                    os.path.join(target, "offsets.u64"), "wb"
+                ) as out_offsets, open(os.path.join(target, "records.bin"), "wb") as out_records:
+                    for start in range(0, len(live), _COMPACT_BLOCK_ROWS):
+                        block = live[start : start + _COMPACT_BLOCK_ROWS]
+                        out_vectors.write(np.ascontiguousarray(vectors[block]).tobytes())
+                        out_codes.write(codes[block].tobytes())
+                        payloads = []
+                        for begin, length in offsets[block]:
+                            source.seek(int(begin))
+                            payloads.append(source.read(int(length)))
+                        lengths = np.array([len(p) for p in payloads], dtype=np.uint64)
+                        starts = written + np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.uint64)
+                        out_offsets.write(np.column_stack([starts, lengths]).astype(np.uint64).tobytes())
+                        out_records.write(b"".join(payloads))
+                        written += int(lengths.sum())
+                with open(os.path.join(target, "deleted.u8"), "wb") as f:
+                    f.write(bytes(len(live)))
+                hashes = np.fromfile(self._data_path("ids.u64"), dtype=np.uint64, count=rows)
+                hashes[live].tofile(os.path.join(target, "ids.u64"))
+                open(os.path.join(target, "ids.idx"), "wb").close()  # rebuilt on first write
+                del vectors
+
+                self._publish({_EPOCH: epoch + 1, _ROWS: len(live)})
+
+                # Readers may still be loading the epoch just replaced; the one before is unused
+                if epoch >= 1:
+                    self._remove_epoch(epoch - 1)
+            logger.info("Compacted shared index: %d -> %d rows (epoch %d)", rows, len(live), epoch + 1)
+        except Exception as e:
+            logger.error(f"Shared index compaction failed: {e}")
+        finally:
+            self._compacting.clear()
+
+    def _remove_epoch(self, epoch: int) -> None:
+        if epoch == 0:
+            for name in _DATA_FILES:
+                try:
+                    os.remove(self._data_path(name, epoch=0))
+                except FileNotFoundError:
+                    pass
+        else:
+            shutil.rmtree(self._epoch_dir(epoch), ignore_errors=True)
+
+    # -- readers --------------------------------------------------------------
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if int(self._header[_GENERATION]) == snapshot.generation:
+            return snapshot
+        with self._refresh_lock:
+            while int(self._header[_GENERATION]) != self._snapshot.generation:
+                generation = int(self._header[_GENERATION])
+                try:
+                    snapshot = self._load(self._snapshot)
+                except (OSError, ValueError):
+                    # Header changed mid-load (compaction published); retry
+                    if int(self._header[_GENERATION]) == generation:
+                        raise
+                    continue
+                self._snapshot = snapshot
+            return self._snapshot
+
+    def _read_header(self) -> np.ndarray:
+        """A consistent copy of the header slots (retries while a writer publishes)."""
+        while True:
+            generation = int(self._header[_GENERATION])
+            if generation % 2 == 0:
+                header = np.array(self._header)
+                if int(self._header[_GENERATION]) == generation:
+                    return header
+            time.sleep(0)
+
+    def _load(self, previous: _Snapshot) -> _Snapshot:
+        header = self._read_header()
+        generation = int(header[_GENERATION])
+        epoch = int(header[_EPOCH])
+        rows = int(header[_ROWS])
+        dim = int(header[_DIM])
+        if rows == 0:
+            return _Snapshot(generation=generation, epoch=epoch)
+        if previous.epoch != epoch:
+            # Compacted: row numbers changed, index from scratch
+            previous = _Snapshot()
+
+        vectors = np.memmap(self._data_path("vectors.f32", epoch), dtype=np.float32, mode="r", shape=(rows, dim))
+        offsets = np.memmap(self._data_path("offsets.u64", epoch), dtype=np.uint64, mode="r", shape=(rows, 2))
+        records = np.memmap(self._data_path("records.bin", epoch), dtype=np.uint8, mode="r")
+        codes = np.memmap(self._data_path("codes.i32", epoch), dtype=np.int32, mode="r", shape=(rows,))
+        deleted = np.memmap(self._data_path("deleted.u8", epoch), dtype=np.uint8, mode="r", shape=(rows,))
+
+        with open(self._data_path("policies.txt", epoch), encoding="utf-8") as f:
+            # Lines past the committed count belong to an unpublished batch
+            policies = f.read().splitlines()[: int(header[_POLICIES])]
+
+        # Only rows added since the previous snapshot need indexing
+        policy_rows = dict(previous.policy_rows)
+        new_codes = np.asarray(codes[previous.rows :])
+        for code in np.unique(new_codes):
+            added = previous.rows + np.flatnonzero(new_codes == code)
+            existing = policy_rows.get(int(code))
+            policy_rows[int(code)] = added if existing is None else np.concatenate([existing, added])
+
+        return _Snapshot(
+            generation=generation,
+            epoch=epoch,
+            rows=rows,
+            vectors=vectors,
+            offsets=offsets,
+            records=records,
+            deleted=deleted,
+            policy_codes={policy_id: code for code, policy_id in enumerate(policies)},
+            policy_rows=policy_rows,
+        )
+
+    @staticmethod
+    def _materialize(snapshot: _Snapshot, row: int) -> DocumentChunk:
+        start, length = (int(v) for v in snapshot.offsets[row])
+        payload = json.loads(bytes(snapshot.records[start : start + length]))
+        return DocumentChunk(
+            id=payload["id"],
+            text=payload["text"],
+            metadata=ChunkMetadata(**payload["metadata"]),
+        )
+
+    def query(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        metadata_filter: Optional[Dict[str, str]] = None,
+        policy_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[float, DocumentChunk]]:
+        if metadata_filter:
+            metadata_filter = {
+                key: page_number_filter(value) if key == "page_number" else value
+                for key, value in metadata_filter.items()
+            }
+        snapshot = self._current()
+        if snapshot.rows == 0 or top_k <= 0:
+            return []
+
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        if policy_ids is None:
+            rows = np.arange(snapshot.rows)
+            scores = snapshot.vectors @ query
+        else:
+            # A compacted-away policy keeps its code but has no rows
+            scoped = [
+                snapshot.policy_rows[snapshot.policy_codes[policy_id]]
+                for policy_id in policy_ids
+                if snapshot.policy_codes.get(policy_id) in snapshot.policy_rows
+            ]
+            if not scoped:
+                return []
+            rows = np.concatenate(scoped)
+            scores = snapshot.vectors[rows] @ query
+        scores[snapshot.deleted[rows] != 0] = -np.inf
+
+        # Best-first walk so metadata filters only materialize what they test
+        if metadata_filter:
+            order = np.argsort(-scores)
+        else:
+            order = np.argpartition(-scores, min(top_k, len(rows)) - 1)[:top_k]
+        results: List[Tuple[float, DocumentChunk]] = []
+        for i in order:
+            if not np.isfinite(scores[i]):
+                if metadata_filter:
+                    break  # sorted: only tombstoned rows are left
+                continue
+            chunk = self._materialize(snapshot, int(rows[i]))
+            if metadata_filter and any(
+                getattr(chunk.metadata, key, None) != value for key, value in metadata_filter.items()
+            ):
+                continue
+            results.append((float(scores[i]), chunk))
+            if len(results) == top_k:
+                break
+        results.sort(key=lambda item: item[0], reverse=True)
+        return results
@@ -0,0 +1,115 @@
+"""
+Two-stage (policy and section centroid) search against the flat scan.
+
+Run from the backend directory:
+    python bench_centroids.py [--chunks 1000000] [--policies 1000] [--sections 20]
+
+Builds one InMemoryVectorStore over a synthetic corpus in which every
+policy section has its own topic (chunks are noisy copies of a section
+direction, as real clauses of one section share vocabulary), then runs the
+same queries with two-stage search off and on. Queries are noisy section
+topics; --spread adds a shared component to every topic, which flattens
+centroid scores and shows the fallback to the flat scan. recall@k is the
+overlap of each two-stage result with the flat scan's top-k.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.schemas.models import ChunkMetadata, DocumentChunk
+from app.vectorstores.in_memory import InMemoryVectorStore
+
+BATCH = 50_000
+
+
+def topics(policies: int, sections: int, dim: int, spread: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    shared = rng.normal(size=dim)
+    centers = rng.normal(size=(policies * sections, dim)) + spread * shared
+    return centers / np.linalg.norm(centers, axis=1, keepdims=True)
+
+
+def corpus(count: int, centers: np.ndarray, sections: int, noise: float):
+    """Yield (embeddings, chunks) batches; chunk i belongs to topic i % len(centers)."""
+    rng = np.random.default_rng(1)
+    dim = centers.shape[1]
+    for start in range(0, count, BATCH):
+        size = min(BATCH, count - start)
+        index = np.arange(start, start + size) % len(centers)
+        embeddings = centers[index] + rng.normal(scale=noise / np.sqrt(dim), size=(size, dim))
+        chunks = [
+            DocumentChunk(
+                id=f"c{i}",
+                text=f"chunk {i}",
+                metadata=ChunkMetadata(
+                    page_number=i % 40 + 1,
+                    source_filename="synthetic.pdf",
+                    policy_id=f"POLICY{t // sections:05d}",
+                    section=f"Section {t % sections}",
+                ),
+            )
+            for i, t in zip(range(start, start + size), index)
+        ]
+        yield embeddings.astype(np.float32), chunks
+
+
+def run_queries(store, queries, top_k: int, **kwargs):
+    store.query(queries[0], top_k=top_k, **kwargs)  # warm up
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        results.append([chunk.id for _, chunk in store.query(query, top_k=top_k, **kwargs)])
+    return results, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def bench(count, dim, policies, sections, queries, top_k, noise, spread) -> None:
+    centers = topics(policies, sections, dim, spread)
+    store = InMemoryVectorStore()
+    started = time.perf_counter()
+    for embeddings, chunks in corpus(count, centers, sections, noise):
+        store.add(embeddings, chunks)
+    print(
+        f"{count} chunks, dim={dim}, {policies} policies x {sections} sections, "
+        f"loaded in {time.perf_counter() - started:.1f}s\n"
+    )
+
+    rng = np.random.default_rng(2)
+    picked = rng.integers(len(centers), size=queries)
+    probes = centers[picked] + rng.normal(scale=noise / np.sqrt(dim), size=(queries, dim))
+    scoped = {"policy_ids": [f"POLICY{picked[0] // sections:05d}"]}
+
+    print(f"{'query':<10}{'flat ms':>9}{'2-stage ms':>12}{'speedup':>9}{'recall@k':>10}")
+    for label, kwargs in (("global", {}), ("scoped", scoped)):
+        settings.vector_store_centroid_min_rows = None
+        flat, flat_ms = run_queries(store, probes, top_k, **kwargs)
+        settings.vector_store_centroid_min_rows = 0
+        pruned, pruned_ms = run_queries(store, probes, top_k, **kwargs)
+        hit = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(flat, pruned)])
+        print(f"{label:<10}{flat_ms:>9.2f}{pruned_ms:>12.2f}{flat_ms / pruned_ms:>8.1f}x{hit:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--policies", type=int, default=1000)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=1.0, help="chunk/query noise norm")
+    parser.add_argument("--spread", type=float, default=0.0, help="shared topic component")
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    bench(
+        args.chunks,
+        args.dim,
+        args.policies,
+        args.sections,
+        args.queries,
+        args.top_k,
+        args.noise,
+        args.spread,
+    )
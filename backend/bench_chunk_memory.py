@@ -0,0 +1,92 @@
+"""
+Resident memory of stored chunk text + metadata: pydantic objects vs columns.
+
+Run from the backend directory:
+    python bench_chunk_memory.py [--chunks 20000]
+
+Builds the same chunks (text from pdf_text.txt, realistic metadata) once as
+a list of DocumentChunk objects, as the in-memory store used to keep them,
+and once as ChunkColumns. Allocations are measured with tracemalloc and
+extrapolated to one million chunks. Embedding matrices are excluded; they
+are identical in both layouts.
+"""
+import argparse
+import gc
+import os
+import tracemalloc
+
+from app.config import settings
+from app.ingestion.parser import _recursive_split
+from app.schemas.models import ChunkMetadata, DocumentChunk
+from app.vectorstores.columns import ChunkColumns, Interner
+
+SECTIONS = ["DEFINITIONS", "EXCLUSIONS", "BENEFITS", "CONDITIONS", "General"]
+
+
+def make_chunks(count: int) -> list[DocumentChunk]:
+    with open("pdf_text.txt", encoding="utf-8") as f:
+        text = f.read()
+    texts = [
+        c.strip()
+        for c in _recursive_split(text, settings.chunk_size, settings.chunk_overlap)
+        if len(c.strip()) >= 50
+    ]
+    chunks = []
+    for i in range(count):
+        policy_id = f"POLICY{i // 500:05d}"
+        chunks.append(
+            DocumentChunk(
+                id=f"{policy_id}#p{i % 40 + 1}#c{i}",
+                # Copy so every chunk owns its text, as after a real ingest
+                text=(texts[i % len(texts)] + " ")[:-1],
+                metadata=ChunkMetadata(
+                    page_number=i % 40 + 1,
+                    source_filename=f"{policy_id}_2020-2021.pdf",
+                    policy_id=policy_id,
+                    section=SECTIONS[i % len(SECTIONS)],
+                    content_type="policy_text",
+                    jurisdiction="IN",
+                    claim_type="health",
+                ),
+            )
+        )
+    return chunks
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def bench(count: int) -> None:
+    pydantic_bytes = measure(lambda: make_chunks(count))
+
+    def build_columns():
+        columns = ChunkColumns(Interner())
+        for start in range(0, count, 1000):
+            columns.extend(make_chunks(min(1000, count - start)))
+        return columns
+
+    columnar_bytes = measure(build_columns)
+
+    scale = 1_000_000 / count
+    print(f"{count} chunks measured, extrapolated to 1M chunks\n")
+    print(f"{'layout':<22}{'bytes/chunk':>12}{'MB per 1M':>12}")
+    for label, used in [("DocumentChunk list", pydantic_bytes), ("ChunkColumns", columnar_bytes)]:
+        print(f"{label:<22}{used / count:>12.0f}{used * scale / 2**20:>12.0f}")
+    print(f"\nreduction: {pydantic_bytes / columnar_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    bench(args.chunks)
@@ -0,0 +1,86 @@
+"""
+Embedding throughput benchmark: chunks/sec vs ONNX threads and worker processes.
+
+Run from the backend directory:
+    python bench_embeddings.py [--chunks 2048]
+
+Each configuration runs in a fresh interpreter (configured through the same
+EMBEDDINGS_* environment variables as the API) so model and pool state do
+not leak between runs. Chunks are cut from pdf_text.txt with the ingest
+splitter, so sizes match what /ingest embeds.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def _load_chunks(count: int) -> list[str]:
+    from app.config import settings
+    from app.ingestion.parser import _recursive_split
+
+    with open("pdf_text.txt", encoding="utf-8") as f:
+        text = f.read()
+    chunks = [
+        c.strip()
+        for c in _recursive_split(text, settings.chunk_size, settings.chunk_overlap)
+        if len(c.strip()) >= 50
+    ]
+    # Repeat the sample policy until we have enough chunks
+    return (chunks * (count // len(chunks) + 1))[:count]
+
+
+def run_one(count: int) -> None:
+    """Child mode: embed `count` chunks with the env-configured settings."""
+    from app.ingestion.embeddings import embed_texts
+
+    texts = _load_chunks(count)
+    # Untimed pass loads the model (or every worker's model) and compiles ONNX
+    embed_texts(texts)
+
+    started = time.perf_counter()
+    embed_texts(texts)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"chunks": count, "seconds": elapsed}))
+
+
+def bench(count: int) -> None:
+    cores = os.cpu_count() or 1
+    steps = sorted({1, 2, 4, 8, 16, 32, cores} & set(range(1, cores + 1)))
+    configs = [{"EMBEDDINGS_THREADS": str(t)} for t in steps]
+    configs += [
+        {"EMBEDDINGS_PARALLEL": str(w), "EMBEDDINGS_PARALLEL_MIN_BATCH": "1"}
+        for w in steps
+        if w > 1
+    ]
+
+    print(f"{count} chunks, {cores} cores\n")
+    print(f"{'mode':<24}{'chunks/sec':>12}{'speedup':>10}")
+    baseline = None
+    for config in configs:
+        env = {**os.environ, "EMBEDDINGS_PROVIDER": "sentence-transformers", **config}
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", "--chunks", str(count)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        rate = result["chunks"] / result["seconds"]
+        baseline = baseline or rate
+        label = ", ".join(f"{k.split('_')[1].lower()}={v}" for k, v in config.items() if "MIN" not in k)
+        print(f"{label:<24}{rate:>12.1f}{rate / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2048)
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+    if args.child:
+        run_one(args.chunks)
+    else:
+        bench(args.chunks)
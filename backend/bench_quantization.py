@@ -0,0 +1,106 @@
+"""
+Recall vs memory for the in-memory store's quantized storage modes.
+
+Run from the backend directory:
+    python bench_quantization.py [--distractors 200000]
+
+Indexes the chunks of pdf_text.txt (plus optional random distractor vectors
+to simulate a large book of business) once per mode, runs the claims.txt
+scenarios, and compares each mode's top-5 against the float32 baseline.
+"""
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+MODES = ["none", "float16", "int8"]
+TOP_K = 5
+
+
+def load_claims(path: str = "../claims.txt") -> list[tuple[str, str]]:
+    """Return (title, claim_text) pairs from the claims.txt scenarios."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    return re.findall(r"^### (.+?)\n\"(.+?)\"", text, flags=re.MULTILINE | re.DOTALL)
+
+
+def build_corpus(distractors: int):
+    from app.config import settings
+    from app.ingestion.embeddings import embed_texts
+    from app.ingestion.parser import _recursive_split
+    from app.schemas.models import ChunkMetadata, DocumentChunk
+
+    with open("pdf_text.txt", encoding="utf-8") as f:
+        text = f.read()
+    texts = [
+        c.strip()
+        for c in _recursive_split(text, settings.chunk_size, settings.chunk_overlap)
+        if len(c.strip()) >= 50
+    ]
+    chunks = [
+        DocumentChunk(
+            text=t,
+            metadata=ChunkMetadata(page_number=1, source_filename="pdf_text.txt", policy_id="sample"),
+        )
+        for t in texts
+    ]
+    embeddings = np.asarray(embed_texts(texts), dtype=np.float32)
+
+    if distractors:
+        rng = np.random.default_rng(0)
+        noise = rng.normal(size=(distractors, embeddings.shape[1])).astype(np.float32)
+        filler = DocumentChunk(
+            text="distractor",
+            metadata=ChunkMetadata(page_number=0, source_filename="synthetic", policy_id="sample"),
+        )
+        embeddings = np.vstack([embeddings, noise])
+        chunks += [filler] * distractors
+    return embeddings, chunks
+
+
+def bench(distractors: int) -> None:
+    from app.config import settings
+    from app.ingestion.embeddings import embed_texts
+    from app.vectorstores.in_memory import InMemoryVectorStore
+
+    embeddings, chunks = build_corpus(distractors)
+    claims = load_claims()
+    queries = embed_texts([claim for _, claim in claims])
+    print(f"{len(chunks)} chunks, {len(claims)} claim scenarios, top_k={TOP_K}\n")
+
+    baseline: list[list[int]] = []
+    print(f"{'mode':<10}{'bytes/chunk':>12}{'vs f32':>8}{'top-5 overlap':>15}{'top-1 match':>13}{'ms/query':>10}")
+    for mode in MODES:
+        settings.vector_store_quantization = mode
+        store = InMemoryVectorStore()
+        batch = 10_000
+        for start in range(0, len(chunks), batch):
+            store.add(embeddings[start : start + batch], chunks[start : start + batch])
+        ids = {id(chunk): i for i, chunk in enumerate(chunks[: len(chunks) - distractors])}
+
+        started = time.perf_counter()
+        results = [store.query(q, top_k=TOP_K) for q in queries]
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        # Distractors are one shared object; map them to -1
+        ranked = [[ids.get(id(c), -1) for _, c in r] for r in results]
+
+        per_chunk = store.nbytes / len(chunks)
+        if mode == "none":
+            baseline = ranked
+            f32_bytes = per_chunk
+        overlap = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(ranked, baseline)])
+        top1 = np.mean([a[:1] == b[:1] for a, b in zip(ranked, baseline)])
+        print(
+            f"{mode:<10}{per_chunk:>12.0f}{f32_bytes / per_chunk:>7.1f}x"
+            f"{overlap:>15.2f}{top1:>13.2f}{elapsed_ms:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--distractors", type=int, default=0)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    bench(args.distractors)
@@ -0,0 +1,92 @@
+"""
+Query latency of the sharded local store as shards (cores) are added.
+
+Run from the backend directory:
+    python bench_sharded.py [--chunks 1000000] [--shards 1,2,4,8]
+
+Fills one ShardedVectorStore per shard count with the same synthetic
+corpus (random unit vectors spread over --policies policies) and times
+unscoped queries, which every shard must scan, and single-policy queries,
+which touch one shard. The single-process InMemoryVectorStore is the
+baseline. Shard counts above the machine's core count stop helping.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.schemas.models import ChunkMetadata, DocumentChunk
+from app.vectorstores.in_memory import InMemoryVectorStore
+from app.vectorstores.sharded import ShardedVectorStore
+
+BATCH = 50_000
+
+
+def corpus(count: int, dim: int, policies: int):
+    """Yield (embeddings, chunks) batches of a reproducible synthetic corpus."""
+    rng = np.random.default_rng(0)
+    for start in range(0, count, BATCH):
+        size = min(BATCH, count - start)
+        embeddings = rng.normal(size=(size, dim)).astype(np.float32)
+        chunks = [
+            DocumentChunk(
+                id=f"c{i}",
+                text=f"chunk {i}",
+                metadata=ChunkMetadata(
+                    page_number=i % 40 + 1,
+                    source_filename="synthetic.pdf",
+                    policy_id=f"POLICY{i % policies:05d}",
+                ),
+            )
+            for i in range(start, start + size)
+        ]
+        yield embeddings, chunks
+
+
+def time_queries(store, queries, **kwargs) -> float:
+    store.query(queries[0], top_k=5, **kwargs)  # warm up
+    started = time.perf_counter()
+    for query in queries:
+        store.query(query, top_k=5, **kwargs)
+    return (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def bench(count: int, dim: int, policies: int, shard_counts: list[int], queries: int) -> None:
+    rng = np.random.default_rng(1)
+    probes = rng.normal(size=(queries, dim)).astype(np.float32)
+    print(f"{count} chunks, dim={dim}, {policies} policies, {os.cpu_count()} cores\n")
+    print(f"{'store':<14}{'load s':>9}{'global ms':>11}{'scoped ms':>11}")
+
+    stores = [("in-memory", InMemoryVectorStore)] + [
+        (f"{n} shards", lambda n=n: ShardedVectorStore(shards=n)) for n in shard_counts
+    ]
+    for label, factory in stores:
+        store = factory()
+        started = time.perf_counter()
+        for embeddings, chunks in corpus(count, dim, policies):
+            store.add(embeddings, chunks)
+        load = time.perf_counter() - started
+
+        global_ms = time_queries(store, probes)
+        scoped_ms = time_queries(store, probes, policy_ids=["POLICY00000"])
+        print(f"{label:<14}{load:>9.1f}{global_ms:>11.2f}{scoped_ms:>11.2f}")
+        del store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--policies", type=int, default=1000)
+    parser.add_argument("--shards", default="1,2,4,8")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    bench(
+        args.chunks,
+        args.dim,
+        args.policies,
+        [int(n) for n in args.shards.split(",")],
+        args.queries,
+    )
@@ -0,0 +1,231 @@
+"""
+Retrieval quality vs cost over a grid of chunking, top_k and embedding settings.
+
+Run from the backend directory:
+    python eval_retrieval.py [--pdf policy.pdf] [--chunk-sizes 500,1000,1500]
+        [--overlaps 0,200] [--top-k 3,5,8] [--models BAAI/bge-small-en-v1.5]
+        [--stores memory,shared,chroma]
+
+Ingests the policy once per (model, store, chunk_size, overlap) into a fresh
+store of each VECTOR_STORE kind (files in a temporary directory), then runs
+the claims.txt scenarios at every top_k. Without --pdf, pdf_text.txt (the
+sample policy) is rendered to a PDF, one text line per line, so it goes
+through parse_pdf (section detection, stable IDs) like an upload. Ingest
+time includes parsing. Index size is resident bytes for the local numpy
+stores and bytes on disk for Chroma. Query latency is the vector search
+alone; claims are embedded before the clock starts.
+
+recall@k is the share of each claim's gold clauses (GOLD_CLAUSES, patterns
+of the policy wording that decides the claim's expected outcome) found in
+its top-k chunks, averaged over claims; "excl" is the same over the claims
+expected to be excluded, where a missed clause flips the decision. Prompt
+tokens are estimated from the analyst prompt built from the top-k chunks
+(~4 characters per token). The clause index is not included: this measures
+vector search alone.
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from bench_quantization import load_claims
+
+# Scenario number in claims.txt -> patterns of the clauses that decide it
+GOLD_CLAUSES = {
+    1: [r"inpatient care - means", r"room rent - means"],
+    2: [r"professional sports, hazardous activities"],
+    3: [r"cosmetic or plastic surgery"],
+    4: [r"spondylosis/ ?spondilitis"],
+    5: [r"alcohol and/or drug abuse"],
+}
+CHARS_PER_TOKEN = 4
+
+
+def load_labelled_claims():
+    """Return (claim_text, expected_decision, gold_patterns) for labelled scenarios."""
+    labelled = []
+    for title, claim in load_claims():
+        number = int(title.split(".", 1)[0])
+        expected = re.search(r"\(Expected: (.+?)\)", title)
+        if number in GOLD_CLAUSES and expected:
+            labelled.append((" ".join(claim.split()), expected.group(1), GOLD_CLAUSES[number]))
+    return labelled
+
+
+def sample_pdf(path: str, directory: str) -> str:
+    """Render a pdf_text.txt-style dump ("--- Page N ---" separators) to a PDF."""
+    import fitz
+
+    with open(path, encoding="utf-8") as f:
+        pages = re.split(r"^--- Page \d+ ---$", f.read(), flags=re.MULTILINE)[1:]
+    doc = fitz.open()
+    for page in pages:
+        lines = page.strip("\n").split("\n")
+        # Tall enough for every line: text off the page would not be extracted
+        doc.new_page(width=595, height=max(842, 72 + 12 * len(lines))).insert_text(
+            (36, 36), "\n".join(lines), fontsize=9
+        )
+    out = os.path.join(directory, os.path.splitext(os.path.basename(path))[0] + ".pdf")
+    doc.save(out)
+    doc.close()
+    return out
+
+
+def use_model(name: str) -> None:
+    """Point the embedder at another model; the next call loads it."""
+    from app.config import settings
+    from app.ingestion import embeddings
+
+    settings.embeddings_model = name
+    # Keep it in-process: worker pools are started with one fixed model
+    settings.embeddings_parallel = None
+    embeddings._model = None
+
+
+def make_store(kind: str, directory: str):
+    """A fresh, empty store of a VECTOR_STORE kind, keeping its files in `directory`."""
+    from app import state
+    from app.config import settings
+
+    settings.vector_store = kind
+    settings.chroma_persist_dir = os.path.join(directory, "chroma")
+    settings.shared_store_dir = os.path.join(directory, "shared")
+    return state._build_store()
+
+
+def index_bytes(store, directory: str) -> int:
+    if hasattr(store, "nbytes"):
+        return store.nbytes
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+def ingest(pdf: str, chunk_size: int, overlap: int, kind: str, directory: str):
+    from app.ingestion.embeddings import embed_texts
+    from app.ingestion.parser import parse_pdf
+
+    started = time.perf_counter()
+    chunks = list(parse_pdf(pdf, "eval", chunk_size=chunk_size, chunk_overlap=overlap))
+    store = make_store(kind, directory)
+    store.add(embed_texts([c.text for c in chunks]), chunks)
+    return store, len(chunks), time.perf_counter() - started
+
+
+def recall(retrieved, patterns) -> float:
+    texts = [" ".join(chunk.text.split()).lower() for _, chunk in retrieved]
+    found = sum(any(re.search(p, t) for t in texts) for p in patterns)
+    return found / len(patterns)
+
+
+def evaluate(store, claims, top_k: int):
+    from app.agents.analyst import build_prompts
+    from app.ingestion.embeddings import embed_texts
+    from app.schemas.models import AnalysisRequest
+
+    recalls, excluded, tokens, latencies = [], [], [], []
+    vectors = embed_texts([claim for claim, _, _ in claims])
+    for (claim, expected, patterns), vector in zip(claims, vectors):
+        started = time.perf_counter()
+        retrieved = store.query(vector, top_k=top_k)
+        latencies.append(time.perf_counter() - started)
+
+        score = recall(retrieved, patterns)
+        recalls.append(score)
+        if expected == "excluded":
+            excluded.append(score)
+        system_prompt, user_prompt = build_prompts(
+            AnalysisRequest(policy_id="eval", claim_text=claim), retrieved
+        )
+        tokens.append((len(system_prompt) + len(user_prompt)) / CHARS_PER_TOKEN)
+    return (
+        float(np.mean(recalls)),
+        float(np.mean(excluded)) if excluded else float("nan"),
+        float(np.median(latencies)) * 1000,
+        float(np.mean(tokens)),
+    )
+
+
+def run(pdf, models, stores, chunk_sizes, overlaps, top_ks, min_recall: float) -> None:
+    from app.config import settings
+    from app.ingestion.embeddings import embed_texts
+
+    if settings.embeddings_provider != "sentence-transformers":
+        # The hash embedder ignores the model name
+        models = [settings.embeddings_provider]
+
+    claims = load_labelled_claims()
+    print(f"{len(claims)} labelled claims, source={os.path.basename(pdf)}\n")
+    header = (
+        f"{'model':<22}{'store':<9}{'chunk':>6}{'ovl':>5}{'k':>4}{'chunks':>7}{'ingest s':>9}"
+        f"{'index KB':>9}{'query ms':>9}{'~prompt tok':>12}{'recall@k':>9}{'excl':>6}"
+    )
+    print(header)
+    rows = []
+    for model in models:
+        if model != settings.embeddings_provider:
+            use_model(model)
+        embed_texts(["warmup"])  # model load is not ingest time
+        for kind in stores:
+            for chunk_size in chunk_sizes:
+                for overlap in overlaps:
+                    if overlap >= chunk_size:
+                        continue
+                    with tempfile.TemporaryDirectory(prefix="eval-") as directory:
+                        store, count, ingest_seconds = ingest(
+                            pdf, chunk_size, overlap, kind, directory
+                        )
+                        size = index_bytes(store, directory)
+                        for top_k in top_ks:
+                            hit, excl, query_ms, tokens = evaluate(store, claims, top_k)
+                            rows.append((model, kind, chunk_size, overlap, top_k, tokens, hit))
+                            print(
+                                f"{model.split('/')[-1]:<22}{kind:<9}{chunk_size:>6}{overlap:>5}"
+                                f"{top_k:>4}{count:>7}{ingest_seconds:>9.2f}{size / 1024:>9.0f}"
+                                f"{query_ms:>9.2f}{tokens:>12.0f}{hit:>9.2f}{excl:>6.2f}"
+                            )
+                        del store
+
+    eligible = [row for row in rows if row[-1] >= min_recall]
+    if eligible:
+        model, kind, chunk_size, overlap, top_k, tokens, hit = min(eligible, key=lambda row: row[5])
+        print(
+            f"\nCheapest with recall@k >= {min_recall:.2f}: model={model} store={kind} "
+            f"chunk_size={chunk_size} overlap={overlap} top_k={top_k} "
+            f"(~{tokens:.0f} prompt tokens, recall {hit:.2f})"
+        )
+    else:
+        print(f"\nNo configuration reaches recall@k >= {min_recall:.2f}")
+
+
+def int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", help="policy PDF to ingest (default: pdf_text.txt)")
+    parser.add_argument("--models", default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--stores", default="memory", help="VECTOR_STORE kinds to compare")
+    parser.add_argument("--chunk-sizes", type=int_list, default=[500, 1000, 1500])
+    parser.add_argument("--overlaps", type=int_list, default=[0, 200])
+    parser.add_argument("--top-k", type=int_list, default=[3, 5, 8])
+    parser.add_argument("--min-recall", type=float, default=1.0)
+    args = parser.parse_args()
+    pdf = os.path.abspath(args.pdf) if args.pdf else None
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory(prefix="eval-sample-") as sample_dir:
+        run(
+            pdf or sample_pdf("pdf_text.txt", sample_dir),
+            args.models.split(","),
+            args.stores.split(","),
+            args.chunk_sizes,
+            args.overlaps,
+            args.top_k,
+            args.min_recall,
+        )
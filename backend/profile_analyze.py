@@ -9,7 +9,7 @@ from app.agents.critic import validate_citations
 from app.schemas.models import AnalysisRequest
 from app.ingestion.embeddings import get_model, embed_texts
 
-def profile():
+async def profile():
     print("Warming up embedder...")
     tw0 = time.time()
     get_model()
@@ -25,21 +25,21 @@ def profile():
     
     print("\nRetrieving chunks...")
     t1 = time.time()
-    retrieved = retrieve_chunks(store, request)
+    retrieved = await retrieve_chunks(store, request)
     print(f"Retrieved {len(retrieved)} chunks in {time.time() - t1:.2f}s")
     
     print("\nAnalyzing claim (1st LLM call)...")
     t2 = time.time()
-    decision, rationale, citations, risk = analyze_claim(request, retrieved)
+    decision, rationale, citations, risk = await analyze_claim(request, retrieved)
     print(f"Decision: {decision}")
     print(f"Analyzed claim in {time.time() - t2:.2f}s")
     
     print("\nValidating citations (2nd LLM call)...")
     t3 = time.time()
-    verified = validate_citations(citations, retrieved)
+    verified = await validate_citations(citations, retrieved)
     print(f"Validated citations in {time.time() - t3:.2f}s")
     
     print(f"\nTotal analysis time (minus warmup): {time.time() - t0:.2f}s")
 
 if __name__ == "__main__":
-    profile()
+    asyncio.run(profile())
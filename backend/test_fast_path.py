@@ -0,0 +1,81 @@
+"""
+The exclusion fast path on the bundled sample policy (pdf_text.txt).
+
+Run from the backend directory (exits non-zero on failure):
+    python test_fast_path.py
+The sample is rendered to a PDF and parsed like an upload. Every chunk is
+then offered to the fast path as a high-scoring match, so these checks
+cover section detection and the fast-path rules without an embedder.
+"""
+import sys
+import tempfile
+
+POLICY_ID = "sample"
+
+_chunks = None
+
+
+def _sample_chunks():
+    global _chunks
+    if _chunks is None:
+        from app.ingestion.parser import parse_pdf
+        from eval_retrieval import sample_pdf
+
+        with tempfile.TemporaryDirectory(prefix="fast-path-") as directory:
+            _chunks = list(parse_pdf(sample_pdf("pdf_text.txt", directory), POLICY_ID))
+    return _chunks
+
+
+def _fast_path(claim_text: str, policy_id: str = POLICY_ID):
+    from app.agents.router import fast_path_response
+    from app.schemas.models import AnalysisRequest
+
+    retrieved = [(1.0, chunk) for chunk in _sample_chunks()]
+    return fast_path_response(AnalysisRequest(policy_id=policy_id, claim_text=claim_text), retrieved)
+
+
+def test_hazardous_activity_exclusion_is_in_an_exclusions_section() -> None:
+    from app.ingestion.parser import clause_kind
+
+    kinds = {
+        clause_kind(chunk.metadata.section)
+        for chunk in _sample_chunks()
+        if "professional sports, hazardous activities" in " ".join(chunk.text.split()).lower()
+    }
+    assert kinds == {"exclusion"}, kinds
+
+
+def test_sky_diving_claim_is_excluded() -> None:
+    response = _fast_path("Broke my leg while sky diving on holiday")
+    assert response is not None and response.decision == "excluded", response
+    citation = response.citations[0]
+    assert citation.policy_id == POLICY_ID and "hazardous activit" in citation.quote.lower(), citation
+
+
+def test_definition_alone_does_not_exclude() -> None:
+    from app.agents.router import fast_path_response
+    from app.ingestion.parser import clause_kind
+    from app.schemas.models import AnalysisRequest
+
+    definitions = [c for c in _sample_chunks() if clause_kind(c.metadata.section) == "definition"]
+    request = AnalysisRequest(policy_id=POLICY_ID, claim_text="Injured while sky diving")
+    assert fast_path_response(request, [(1.0, c) for c in definitions]) is None
+
+
+def test_unsure_claims_go_to_the_llm() -> None:
+    assert _fast_path("Broke my leg while sky diving", policy_id="global") is None
+    assert _fast_path("Fell down stairs; blood alcohol test came back negative") is None
+    assert _fast_path("Patient was not drunk at the time of the fall") is None
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            try:
+                check()
+                print(f"ok    {name}")
+            except Exception as e:
+                failed += 1
+                print(f"FAIL  {name}: {type(e).__name__}: {e}")
+    sys.exit(1 if failed else 0)
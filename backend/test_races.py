@@ -0,0 +1,151 @@
+"""
+Lock-free reads racing writes in the in-memory store, and lazily built
+singletons racing their first callers.
+
+Run from the backend directory (exits non-zero on failure):
+    python test_races.py
+Each check runs a writer thread against readers for a fixed time, so a
+pass is evidence rather than proof; a failure is always a real race.
+"""
+import sys
+import threading
+import time
+
+import numpy as np
+
+RUN_SECONDS = 1.0
+
+
+def _chunk(i: int, policy_id: str = "P"):
+    from app.schemas.models import ChunkMetadata, DocumentChunk
+
+    return DocumentChunk(
+        id=f"{policy_id}#c{i}",
+        text=f"text of chunk {i}",
+        metadata=ChunkMetadata(page_number=1 + i % 5, source_filename="f.pdf", policy_id=policy_id),
+    )
+
+
+def _race(write, read) -> None:
+    """Run write() in a loop on a thread while read() runs here; re-raise either's error."""
+    errors = []
+    stop = threading.Event()
+
+    def writer() -> None:
+        try:
+            while not stop.is_set():
+                write()
+        except Exception as e:  # surfaced below
+            errors.append(e)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + RUN_SECONDS
+    try:
+        while time.monotonic() < deadline and not errors:
+            read()
+    finally:
+        stop.set()
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def test_search_during_add() -> None:
+    """Searches see a consistent prefix of rows while add() appends (user-034)."""
+    from app.vectorstores.in_memory import InMemoryVectorStore
+
+    store = InMemoryVectorStore()
+    rng = np.random.default_rng(0)
+    added = [0]
+
+    def write() -> None:
+        start = added[0]
+        chunks = [_chunk(i) for i in range(start, start + 200)]
+        store.add(rng.normal(size=(len(chunks), 16)).astype(np.float32), chunks)
+        added[0] += len(chunks)
+
+    query = rng.normal(size=16).astype(np.float32)
+
+    def read() -> None:
+        for score, chunk in store.query(query, top_k=20, metadata_filter={"page_number": "3"}):
+            number = int(chunk.id.split("#c")[1])
+            assert chunk.text == f"text of chunk {number}", (chunk.id, chunk.text)
+            assert chunk.metadata.page_number == 3, chunk
+
+    _race(write, read)
+
+
+
+def test_string_arena_during_extend() -> None:
+    """The last committed string never has bytes of an in-flight extend() glued on (user-033)."""
+    from app.vectorstores.columns import _StringArena
+
+    arena = _StringArena()
+    arena.extend(["hello", "world"])
+    committed = [2]
+
+    def write() -> None:
+        # A large batch keeps the buffer ahead of the offsets for a while
+        arena.extend(["NEWTEXT"] * 1000)
+        committed[0] += 1000
+
+    def read() -> None:
+        value = arena.get(committed[0] - 1)
+        assert value in ("world", "NEWTEXT"), value[:40]
+
+    _race(write, read)
+
+
+def test_singletons_built_once() -> None:
+    """Concurrent first calls share one catalog and one clause index (user-031)."""
+    import tempfile
+
+    from app import state
+    from app.config import settings
+
+    built = []
+
+    def slow(real):
+        def build(*args):
+            time.sleep(0.05)  # widen the window between the check and the assignment
+            built.append(real)
+            return real(*args)
+
+        return build
+
+    saved = state.Catalog, state.ClauseIndex, state._CATALOG, state._CLAUSE_INDEX, settings.catalog_path
+    with tempfile.TemporaryDirectory(prefix="races-") as directory:
+        state.Catalog, state.ClauseIndex = slow(state.Catalog), slow(state.ClauseIndex)
+        state._CATALOG = state._CLAUSE_INDEX = None
+        settings.catalog_path = f"{directory}/catalog.db"
+        try:
+            start = threading.Barrier(8)
+            seen = []
+
+            def first_call() -> None:
+                start.wait()
+                seen.append((state.get_catalog(), state.get_clause_index()))
+
+            threads = [threading.Thread(target=first_call) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            state.Catalog, state.ClauseIndex, state._CATALOG, state._CLAUSE_INDEX, settings.catalog_path = saved
+    assert len(built) == 2, f"{len(built)} constructions for 2 singletons"
+    assert len({id(catalog) for catalog, _ in seen}) == 1 and len({id(index) for _, index in seen}) == 1
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            try:
+                check()
+                print(f"ok    {name}")
+            except Exception as e:
+                failed += 1
+                print(f"FAIL  {name}: {type(e).__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,71 @@
+"""
+Cold-start import cost of the API, measured with `python -X importtime`.
+
+Run from the backend directory (exits non-zero on failure):
+    python test_startup_imports.py
+Each check imports app.main in a fresh interpreter. SDKs for the vector
+store, PDF parser, LLM and LangGraph must only load on first use.
+"""
+import os
+import subprocess
+import sys
+
+# Modules that must not be imported just to start the API process
+LAZY_MODULES = [
+    "fitz", "groq", "pinecone", "chromadb", "langgraph", "fastembed", "onnxruntime",
+    "sentence_transformers", "torch",
+]
+
+
+def measure(module: str = "app.main", **env: str) -> dict[str, int]:
+    """Return {module: cumulative import time in microseconds}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **env},
+    )
+    assert result.returncode == 0, f"import {module} failed:\n{result.stderr[-2000:]}"
+    timings: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line.split("|")
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def _eager(timings: dict[str, int]) -> list[str]:
+    return sorted(
+        {name for name in timings for lazy in LAZY_MODULES if name == lazy or name.startswith(lazy + ".")}
+    )
+
+
+def test_default_startup_imports_no_optional_sdk() -> None:
+    eager = _eager(measure())
+    assert not eager, f"eagerly imported optional modules: {', '.join(eager)}"
+
+
+def test_configured_backends_still_load_lazily() -> None:
+    # Settings name the SDKs but building them is deferred to first use
+    for store in ("pinecone", "chroma"):
+        eager = _eager(measure(VECTOR_STORE=store, EMBEDDINGS_PROVIDER="sentence-transformers"))
+        assert not eager, f"VECTOR_STORE={store}: eagerly imported {', '.join(eager)}"
+
+
+if __name__ == "__main__":
+    timings = measure()
+    print(f"import app.main: {timings.get('app.main', 0) / 1000:.1f} ms cumulative")
+    for name, cumulative in sorted(timings.items(), key=lambda kv: kv[1], reverse=True)[:10]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            try:
+                check()
+                print(f"ok    {name}")
+            except Exception as e:
+                failed += 1
+                print(f"FAIL  {name}: {type(e).__name__}: {e}")
+    sys.exit(1 if failed else 0)
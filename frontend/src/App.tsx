@@ -40,6 +40,9 @@ export default function App() {
             chunks_indexed?: number | null;
         }>
     >([]);
+    // Claims are analyzed against one policy: its clauses alone, and the cost
+    // of a search depends on that policy's size rather than the whole corpus
+    const [selectedPolicyId, setSelectedPolicyId] = useState("");
 
     const refreshPolicies = async () => {
         try {
@@ -52,6 +55,11 @@ export default function App() {
             const data = await response.json();
             logDebug("Policies fetched", { count: data?.length ?? 0 });
             setPolicies(data);
+            setSelectedPolicyId((current) =>
+                data.some((policy: { policy_id: string }) => policy.policy_id === current)
+                    ? current
+                    : data[0]?.policy_id ?? ""
+            );
         } catch (error) {
             logDebug("Policies fetch error", error);
         }
@@ -91,6 +99,7 @@ export default function App() {
             setTimeout(() => setNotification(null), 4000);
             setAnalysis(null);
             setSelectedQuote(null);
+            setSelectedPolicyId(policyId);
             refreshPolicies();
         } catch (error) {
             logDebug("Policy ingest error", error);
@@ -105,17 +114,21 @@ export default function App() {
             setStatusMessage("Enter a claim description.");
             return;
         }
+        if (!selectedPolicyId) {
+            setStatusMessage("Upload or select a policy to analyze against.");
+            return;
+        }
 
         setIsAnalyzing(true);
         try {
-            logDebug("Analyzing claim");
+            logDebug("Analyzing claim", { policyId: selectedPolicyId });
             setStatusMessage("Analyzing claim...");
 
             const response = await fetch(`${API_BASE}/analyze`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({
-                    policy_id: "global",
+                    policy_id: selectedPolicyId,
                     claim_text: claimText
                 })
             });
@@ -190,8 +203,8 @@ export default function App() {
                     />
                     <PolicyList
                         policies={policies}
-                        selectedPolicyId=""
-                        onSelect={() => { }}
+                        selectedPolicyId={selectedPolicyId}
+                        onSelect={setSelectedPolicyId}
                     />
                 </section>
             </main>